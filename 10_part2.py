@@ -1,4 +1,43 @@
-import collections
+"""
+Example:
+
+>>> example = TopographicMap.load_text("\\n".join([
+...     "89010123",
+...     "78121874",
+...     "87430965",
+...     "96549874",
+...     "45678903",
+...     "32019012",
+...     "01329801",
+...     "10456732",
+... ]))
+>>> example.get_trailheads().sum_scores()
+36
+>>> example.get_trailheads().sum_ratings()
+81
+
+Heights are not limited to single digits. A single trail thousands of levels
+tall works without hitting the recursion limit:
+
+>>> tall = TopographicMap.from_rows([list(range(5000))], top=4999)
+>>> tall.get_trailheads().sum_scores()
+1
+>>> tall.get_trailheads().sum_ratings()
+1
+
+Part 1:
+
+>>> TopographicMap.load().get_trailheads().sum_scores()
+667
+
+Part 2:
+
+>>> TopographicMap.load().get_trailheads().sum_ratings()
+1344
+"""
+
+import array
+import doctest
 
 
 class TopographicMap:
@@ -10,100 +49,116 @@ class TopographicMap:
 
     @classmethod
     def load_text(cls, text):
-        topographic_map = cls()
-        for y, row in enumerate(text.splitlines()):
-            for x, height in enumerate(row):
-                topographic_map.add(x, y, int(height))
-        return topographic_map
-
-    def __init__(self):
-        self.cells = {}
+        return cls.from_rows(
+            [[int(height) for height in row] for row in text.splitlines()]
+        )
 
-    def add(self, x, y, height):
-        point = Point(x, y)
-        self.cells[point] = Cell(point, height, self)
-
-    def get(self, point):
-        return self.cells.get(point, CellOutsideMap())
+    @classmethod
+    def from_rows(cls, rows, top=9):
+        return cls(
+            width=len(rows[0]) if rows else 0,
+            heights=[height for row in rows for height in row],
+            top=top,
+        )
+
+    def __init__(self, width, heights, top=9):
+        """
+        Heights are stored in a bytearray when they all fit in a byte.
+
+        >>> TopographicMap.from_rows([[0, 1, 300]]).heights
+        array('i', [0, 1, 300])
+        >>> TopographicMap.from_rows([[0, 1, 300]]).get_trailheads().sum_scores()
+        0
+        >>> TopographicMap.from_rows([[-1, 0, 1]], top=1).heights
+        array('i', [-1, 0, 1])
+        >>> TopographicMap.from_rows([[-1, 0, 1]], top=1).get_trailheads().sum_scores()
+        1
+        """
+        self.width = width
+        self.top = top
+        heights = list(heights)
+        if min(heights, default=0) >= 0 and max(heights, default=0) < 256:
+            self.heights = bytearray(heights)
+        else:
+            self.heights = array.array("i", heights)
 
     def get_trailheads(self):
-        return Cells([cell for cell in self.cells.values() if cell.is_trailhead()])
-
-
-class Cells:
-
-    def __init__(self, cells):
-        self.cells = cells
+        return Trailheads(self)
+
+    def layers(self):
+        """
+        Cell indices bucketed by height. Cells below 0 or above the top can
+        never be part of a trail and are left out.
+
+        >>> TopographicMap.from_rows([[0, 1], [2, 9], [-1, 2]], top=2).layers()
+        [[0], [1], [2, 5]]
+        """
+        layers = [[] for _ in range(self.top + 1)]
+        for index, height in enumerate(self.heights):
+            if 0 <= height <= self.top:
+                layers[height].append(index)
+        return layers
+
+    def uphill_neighbours(self, index):
+        wanted = self.heights[index] + 1
+        heights = self.heights
+        x = index % self.width
+        if x > 0 and heights[index - 1] == wanted:
+            yield index - 1
+        if x < self.width - 1 and heights[index + 1] == wanted:
+            yield index + 1
+        if index >= self.width and heights[index - self.width] == wanted:
+            yield index - self.width
+        if index + self.width < len(heights) and heights[index + self.width] == wanted:
+            yield index + self.width
+
+    def propagate(self, top_value, combine):
+        """
+        Walk the layers from the top down to the trailheads, computing a value
+        for every cell from the values of its uphill neighbours. Only the values
+        of the layer directly above are kept, so the number of values in memory
+        is bounded by the widest layer. The layers themselves hold one index
+        per cell.
+
+        Returns the values of all trailheads.
+        """
+        layers = self.layers()
+        above = {index: top_value(index) for index in layers[self.top]}
+        for layer in reversed(layers[: self.top]):
+            above = {
+                index: combine(
+                    above[neighbour] for neighbour in self.uphill_neighbours(index)
+                )
+                for index in layer
+            }
+        return above.values()
+
+
+class Trailheads:
+
+    def __init__(self, topographic_map):
+        self.topographic_map = topographic_map
 
     def sum_scores(self):
-        return sum(cell.get_score() for cell in self.cells)
+        return sum(
+            len(tops)
+            for tops in self.topographic_map.propagate(
+                top_value=lambda index: frozenset([index]),
+                combine=lambda tops: frozenset().union(*tops),
+            )
+        )
 
     def sum_ratings(self):
-        return sum(cell.get_rating() for cell in self.cells)
-
-
-class Cell:
-
-    def __init__(self, point, height, topographic_map):
-        self.point = point
-        self.height = height
-        self.topographic_map = topographic_map
-
-    def is_trailhead(self):
-        return self.has_height(0)
-
-    def has_height(self, height):
-        return self.height == height
-
-    def get_score(self):
-        return len(self.get_reachable_tops())
-
-    def get_reachable_tops(self):
-        if self.has_height(9):
-            return {self.point}
-        else:
-            result = set()
-            for point in self.point.directions():
-                cell = self.topographic_map.get(point)
-                if cell.has_height(self.height + 1):
-                    result |= cell.get_reachable_tops()
-            return result
-
-    def get_rating(self):
-        if self.has_height(9):
-            return 1
-        else:
-            result = 0
-            for point in self.point.directions():
-                cell = self.topographic_map.get(point)
-                if cell.has_height(self.height + 1):
-                    result += cell.get_rating()
-            return result
-
-    def __repr__(self):
-        return f"Cell(point={self.point!r}, height={self.height!r})"
-
-
-class CellOutsideMap:
-
-    def has_height(self, height):
-        return False
-
-
-class Point(collections.namedtuple("Point", ["x", "y"])):
-
-    def directions(self):
-        return [
-            self.move(dx=-1),
-            self.move(dx=1),
-            self.move(dy=-1),
-            self.move(dy=1),
-        ]
-
-    def move(self, dx=0, dy=0):
-        return Point(x=self.x + dx, y=self.y + dy)
-
-
-print(TopographicMap.load().get_trailheads().sum_scores())
-print(TopographicMap.load().get_trailheads().sum_ratings())
-print("OK")
+        return sum(
+            self.topographic_map.propagate(
+                top_value=lambda index: 1,
+                combine=sum,
+            )
+        )
+
+
+if __name__ == "__main__":
+    doctest.testmod()
+    print(TopographicMap.load().get_trailheads().sum_scores())
+    print(TopographicMap.load().get_trailheads().sum_ratings())
+    print("OK")
@@ -21,81 +21,352 @@ Part 2:
 259112729857522
 """
 
+import bisect
+import collections
 import doctest
+import fractions
 
 
 class Stones:
 
     @classmethod
     def load_text(cls, text):
-        stones = cls()
-        for number in text.split(" "):
-            stones.add(Stone(int(number)))
-        return stones
+        return cls(int(number) for number in text.split(" "))
 
-    def __init__(self, stones=[]):
-        self.stones = list(stones)
-
-    def add(self, stone):
-        self.stones.append(stone)
+    def __init__(self, numbers=()):
+        self.numbers = list(numbers)
 
     def evolve(self, times):
-        return Stones([stone.evolve(times) for stone in self.stones])
+        return EvolvingStones(self.numbers, times)
 
     def count(self):
-        return sum(stone.count() for stone in self.stones)
+        return len(self.numbers)
 
     def __repr__(self):
-        return " ".join(repr(x) for x in self.stones)
+        return " ".join(str(number) for number in self.numbers)
 
 
-class Stone:
+class EvolvingStones:
 
-    def __init__(self, number):
-        self.number = number
+    def __init__(self, numbers, times, transitions=None):
+        self.numbers = numbers
+        self.times = times
+        self.transitions = Transitions() if transitions is None else transitions
 
     def evolve(self, times):
-        return LazyStone(number=self.number, times=times)
+        return EvolvingStones(self.numbers, self.times + times, self.transitions)
 
     def count(self):
-        return 1
+        """
+        The order of stones does not matter for the count, so only the number
+        of stones with each number is tracked.
+
+        >>> Stones.load_text("0 0 1").evolve(1000).count() > 0
+        True
+
+        For many blinks, the count is fast forwarded if the stones only ever
+        turn into a small set of numbers:
+
+        >>> Stones.load_text("0").evolve(20000).count() % 10**20
+        57997102625315265785
+        >>> Stones.load_text("0").evolve(20000).count_by_blinking() % 10**20
+        57997102625315265785
+        """
+        if self.times >= ReachableNumbers.MIN_TIMES:
+            reachable = self.transitions.reachable(self.numbers)
+            if reachable is not None and reachable.is_faster_than_blinking(self.times):
+                return reachable.count(self.numbers, self.times)
+        return self.count_by_blinking()
+
+    def count_by_blinking(self):
+        counts = collections.Counter(self.numbers)
+        for _ in range(self.times):
+            counts = self.transitions.blink(counts)
+        return sum(counts.values())
 
     def __repr__(self):
-        return str(self.number)
+        numbers = self.numbers
+        for _ in range(self.times):
+            numbers = [
+                child for number in numbers for child in self.transitions.get(number)
+            ]
+        return repr(Stones(numbers))
 
 
-class LazyStone:
+class Transitions:
+    """
+    Maps a stone number to the numbers it turns into after one blink.
 
-    cache = {}
+    Only the most recently used numbers are kept:
 
-    def __init__(self, number, times):
-        self.number = number
-        self.times = times
+    >>> transitions = Transitions(size=2)
+    >>> transitions.get(0)
+    (1,)
+    >>> transitions.get(10)
+    (1, 0)
+    >>> transitions.get(1)
+    (2024,)
+    >>> list(transitions.children)
+    [10, 1]
+    """
 
-    def evolve(self, times):
-        if times == 0:
-            return Stone(self.number)
+    def __init__(self, size=4096):
+        self.size = size
+        self.children = collections.OrderedDict()
+        self.discovered = {}
+
+    def get(self, number):
+        if number in self.children:
+            self.children.move_to_end(number)
         else:
-            stones = Stones()
-            if self.number == 0:
-                stones.add(Stone(1))
-            elif len(str(self.number)) % 2 == 0:
-                text = str(self.number)
-                split_index = len(text) // 2
-                stones.add(Stone(int(text[:split_index])))
-                stones.add(Stone(int(text[split_index:])))
+            self.children[number] = Stone(number).blink()
+            if len(self.children) > self.size:
+                self.children.popitem(last=False)
+        return self.children[number]
+
+    def reachable(self, numbers):
+        """
+        The numbers reachable from the given ones. They are discovered once
+        per set of numbers, also when there are too many of them:
+
+        >>> transitions = Transitions()
+        >>> transitions.reachable([510613]) is None
+        True
+        >>> transitions.discovered
+        {frozenset({510613}): None}
+        """
+        key = frozenset(numbers)
+        if key not in self.discovered:
+            self.discovered[key] = ReachableNumbers.discover(numbers, self)
+        return self.discovered[key]
+
+    def blink(self, counts):
+        next_counts = collections.Counter()
+        for number, count in counts.items():
+            for child in self.get(number):
+                next_counts[child] += count
+        return next_counts
+
+
+class ReachableNumbers:
+    """
+    All numbers reachable from some stones. Row n holds how many stones of
+    each number a stone with number n turns into after one blink.
+
+    The rows form a transition matrix, but squaring it is too slow because
+    multiplying the huge counts is much slower than adding them. Instead,
+    the count is fast forwarded with the linear recurrence it follows.
+
+    >>> reachable = ReachableNumbers.discover([0], Transitions())
+    >>> len(reachable.rows)
+    54
+    >>> reachable.count([0], 6)
+    7
+    >>> reachable.count([0], 2000) == Stones.load_text("0").evolve(2000).count_by_blinking()
+    True
+    >>> Stones.load_text("0").evolve(6)
+    40 48 2024 40 48 80 96
+    """
+
+    MIN_TIMES = 1000
+    MAX_STATES = 500
+
+    @classmethod
+    def discover(cls, numbers, transitions):
+        """
+        Find all numbers reachable from the given ones. Returns None if there
+        are more than MAX_STATES of them.
+
+        >>> ReachableNumbers.discover([510613], Transitions()) is None
+        True
+        """
+        rows = {}
+        to_visit = list(numbers)
+        while to_visit:
+            number = to_visit.pop()
+            if number not in rows:
+                if len(rows) >= cls.MAX_STATES:
+                    return None
+                rows[number] = collections.Counter(transitions.get(number))
+                to_visit.extend(rows[number])
+        return cls(rows)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def is_faster_than_blinking(self, times):
+        """
+        Blinking costs one step per number and blink. Fast forwarding costs
+        about one step per number squared, mostly to find the recurrence.
+
+        >>> reachable = ReachableNumbers.discover([0], Transitions())
+        >>> reachable.is_faster_than_blinking(1000)
+        False
+        >>> reachable.is_faster_than_blinking(10000)
+        True
+        """
+        return len(self.rows) ** 2 < times
+
+    def count(self, numbers, times):
+        return self.recurrence(numbers).term(times)
+
+    def recurrence(self, numbers):
+        """
+        By Cayley-Hamilton, the number of stones after t blinks follows a
+        linear recurrence no longer than the number of rows. Twice that many
+        terms are enough to find it.
+
+        >>> recurrence = ReachableNumbers.discover([0], Transitions()).recurrence([0])
+        >>> len(recurrence.coefficients)
+        38
+        """
+        counts = collections.Counter(numbers)
+        totals = []
+        for _ in range(2 * len(self.rows)):
+            totals.append(sum(counts.values()))
+            counts = self.apply(counts)
+        return LinearRecurrence.find(totals)
+
+    def apply(self, counts):
+        next_counts = collections.Counter()
+        for number, count in counts.items():
+            for child, child_count in self.rows[number].items():
+                next_counts[child] += count * child_count
+        return next_counts
+
+
+class LinearRecurrence:
+    """
+    Sequence where term n is the sum of coefficients[i] * term[n - 1 - i].
+
+    >>> fibonacci = LinearRecurrence.find([0, 1, 1, 2, 3, 5, 8, 13])
+    >>> fibonacci.coefficients
+    [1, 1]
+    >>> [fibonacci.term(n) for n in range(10)]
+    [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]
+    >>> fibonacci.term(300)
+    222232244629420445529739893461909967206666939096499764990979600
+    """
+
+    @classmethod
+    def find(cls, terms):
+        """
+        Berlekamp-Massey over the rationals. The coefficients are integers
+        when the terms come from an integer matrix.
+        """
+        connection = [fractions.Fraction(1)]
+        previous = [fractions.Fraction(1)]
+        previous_discrepancy = fractions.Fraction(1)
+        length = 0
+        shift = 1
+        for n, term in enumerate(terms):
+            discrepancy = term + sum(
+                connection[i] * terms[n - i] for i in range(1, length + 1)
+            )
+            if discrepancy == 0:
+                shift += 1
+                continue
+            factor = discrepancy / previous_discrepancy
+            adjusted = connection + [0] * (len(previous) + shift - len(connection))
+            for i, coefficient in enumerate(previous):
+                adjusted[i + shift] -= factor * coefficient
+            if 2 * length <= n:
+                previous = connection
+                previous_discrepancy = discrepancy
+                length = n + 1 - length
+                shift = 1
             else:
-                stones.add(Stone(self.number * 2024))
-            return stones.evolve(times - 1)
+                shift += 1
+            connection = adjusted
+        connection += [0] * (length + 1 - len(connection))
+        coefficients = []
+        for coefficient in connection[1 : length + 1]:
+            assert coefficient.denominator == 1
+            coefficients.append(-int(coefficient))
+        return cls(coefficients, terms[:length])
 
-    def count(self):
-        key = (self.number, self.times)
-        if key not in self.cache:
-            self.cache[key] = self.evolve(self.times).count()
-        return self.cache[key]
+    def __init__(self, coefficients, initial):
+        self.coefficients = coefficients
+        self.initial = initial
 
-    def __repr__(self):
-        return repr(self.evolve(self.times))
+    def term(self, n):
+        """
+        Term n is a combination of the initial terms with the coefficients of
+        x**n modulo the characteristic polynomial. That is computed with
+        repeated squaring in O(log n) polynomial multiplications.
+        """
+        order = len(self.coefficients)
+        if n < order:
+            return self.initial[n]
+        result = self.reduce([1])
+        power = self.reduce([0, 1])
+        while n:
+            if n & 1:
+                result = self.multiply(result, power)
+            n >>= 1
+            if n:
+                power = self.multiply(power, power)
+        return sum(x * y for x, y in zip(result, self.initial))
+
+    def multiply(self, left, right):
+        product = [0] * (len(left) + len(right) - 1)
+        for i, x in enumerate(left):
+            if x:
+                for j, y in enumerate(right):
+                    product[i + j] += x * y
+        return self.reduce(product)
+
+    def reduce(self, polynomial):
+        """
+        Rewrite x**k for k >= order using x**order = sum(c[i] * x**(order-1-i)).
+        """
+        order = len(self.coefficients)
+        polynomial = polynomial + [0] * (order - len(polynomial))
+        for k in range(len(polynomial) - 1, order - 1, -1):
+            x = polynomial[k]
+            if x:
+                for i, coefficient in enumerate(self.coefficients, 1):
+                    polynomial[k - i] += x * coefficient
+        return polynomial[:order]
+
+
+POWERS_OF_TEN = tuple(10**exponent for exponent in range(20))
+
+
+class Stone:
+
+    def __init__(self, number):
+        self.number = number
+
+    def blink(self):
+        if self.number == 0:
+            return (1,)
+        digits = self.digits()
+        if digits % 2 == 0:
+            half = digits // 2
+            if half < len(POWERS_OF_TEN):
+                return divmod(self.number, POWERS_OF_TEN[half])
+            return divmod(self.number, 10**half)
+        return (self.number * 2024,)
+
+    def digits(self):
+        """
+        >>> [Stone(number).digits() for number in [0, 9, 10, 99, 100, 253000]]
+        [1, 1, 2, 2, 3, 6]
+
+        >>> [Stone(number).digits() for number in [10**19 - 1, 10**19, 10**30]]
+        [19, 20, 31]
+        >>> Stone(12 * 10**40 + 34).blink()
+        (120000000000000000000, 34)
+        """
+        if self.number < POWERS_OF_TEN[-1]:
+            return max(1, bisect.bisect_right(POWERS_OF_TEN, self.number))
+        digits = len(POWERS_OF_TEN)
+        power = POWERS_OF_TEN[-1] * 10
+        while self.number >= power:
+            digits += 1
+            power *= 10
+        return digits
 
 
 doctest.testmod()
@@ -35,7 +35,7 @@ Part 2:
 844132
 """
 
-import collections
+import array
 import doctest
 
 
@@ -48,30 +48,122 @@ class Garden:
 
     @classmethod
     def load_text(cls, text):
-        garden = cls()
-        for y, row in enumerate(text.splitlines()):
-            for x, plant in enumerate(row):
-                garden.add(x, y, plant)
-        return garden
-
-    def __init__(self):
-        self.plants = {}
-
-    def add(self, x, y, plant):
-        point = Point(x, y)
-        self.plants[point] = Plant(point=point, plant=plant, garden=self)
-
-    def get(self, point):
-        return self.plants.get(point, NoPlant())
+        """
+        Plants are stored row by row with a border of zeros around them so
+        that every plant has four neighbours.
+
+        >>> garden = Garden.load_text("AB\\nCD")
+        >>> garden.width
+        4
+        >>> list(garden.plants)
+        [0, 0, 0, 0, 0, 65, 66, 0, 0, 67, 68, 0, 0, 0, 0, 0]
+
+        Short rows are padded with zeros:
+
+        >>> list(Garden.load_text("AB\\nC").plants)
+        [0, 0, 0, 0, 0, 65, 66, 0, 0, 67, 0, 0, 0, 0, 0, 0]
+        >>> Garden.load_text("").regions().count()
+        0
+        """
+        rows = text.splitlines()
+        width = max((len(row) for row in rows), default=0) + 2
+        plants = bytearray(width)
+        for row in rows:
+            plants += b"\0" + row.encode("ascii").ljust(width - 1, b"\0")
+        plants += bytearray(width)
+        return cls(plants, width)
+
+    def __init__(self, plants, width):
+        self.plants = plants
+        self.width = width
 
     def regions(self):
+        """
+        Label connected plants in a single raster scan. Each plant is joined
+        with its left and upper neighbour in a union-find structure, and the
+        area, perimeter, and side counters of joined regions are merged.
+
+        A region has as many sides as corners. Each plant contributes the
+        convex and concave corners found in its 3x3 neighbourhood.
+
+        Labels are stored for every cell of the padded grid, with -1 where
+        there is no plant:
+
+        >>> regions = Garden.load_text("AAB\\nABB").regions()
+        >>> list(regions.labels[5:15])
+        [-1, 0, 0, 1, -1, -1, 0, 1, 1, -1]
+        >>> len(regions.labels) == len(Garden.load_text("AAB\\nABB").plants)
+        True
+        >>> [(region.area, region.perimiter) for region in regions.regions]
+        [(3, 8), (3, 8)]
+        >>> [region.sides for region in regions.regions]
+        [6, 6]
+        """
+        plants = self.plants
+        width = self.width
+        parents = array.array("i", range(len(plants)))
+        areas = array.array("i", [0]) * len(plants)
+        perimiters = array.array("i", [0]) * len(plants)
+        sides = array.array("i", [0]) * len(plants)
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        def union(index, other):
+            root = find(index)
+            other_root = find(other)
+            if root != other_root:
+                parents[other_root] = root
+                areas[root] += areas[other_root]
+                perimiters[root] += perimiters[other_root]
+                sides[root] += sides[other_root]
+
+        for index in range(width, len(plants) - width):
+            plant = plants[index]
+            if plant:
+                left = plants[index - 1] == plant
+                right = plants[index + 1] == plant
+                up = plants[index - width] == plant
+                down = plants[index + width] == plant
+                areas[index] = 1
+                perimiters[index] = 4 - left - right - up - down
+                corners = 0
+                for horizontal, vertical, diagonal in [
+                    (left, up, index - width - 1),
+                    (right, up, index - width + 1),
+                    (left, down, index + width - 1),
+                    (right, down, index + width + 1),
+                ]:
+                    if not horizontal and not vertical:
+                        corners += 1
+                    elif horizontal and vertical and plants[diagonal] != plant:
+                        corners += 1
+                sides[index] = corners
+                if left:
+                    union(index - 1, index)
+                if up:
+                    union(index - width, index)
+
         regions = Regions()
-        visited = set()
-        for point, plant in self.plants.items():
-            if point not in visited:
-                region = plant.region()
-                region.mark_visited(visited)
-                regions.add(region)
+        labels = array.array("i", [-1]) * len(plants)
+        label_by_root = {}
+        for index in range(width, len(plants) - width):
+            if plants[index]:
+                root = find(index)
+                if root not in label_by_root:
+                    label_by_root[root] = regions.count()
+                    regions.add(
+                        Region(
+                            area=areas[root],
+                            perimiter=perimiters[root],
+                            sides=sides[root],
+                        )
+                    )
+                labels[index] = label_by_root[root]
+        regions.labels = labels
         return regions
 
 
@@ -79,6 +171,7 @@ class Regions:
 
     def __init__(self, regions=[]):
         self.regions = list(regions)
+        self.labels = array.array("i")
 
     def add(self, region):
         self.regions.append(region)
@@ -95,139 +188,16 @@ class Regions:
 
 class Region:
 
-    def __init__(self, plants=[]):
-        self.plants = list(plants)
-
-    def add(self, plant):
-        self.plants.append(plant)
-
-    def mark_visited(self, visited):
-        for plant in self.plants:
-            plant.mark_visited(visited)
+    def __init__(self, area, perimiter, sides):
+        self.area = area
+        self.perimiter = perimiter
+        self.sides = sides
 
     def price(self):
-        return self.area() * self.perimiter()
+        return self.area * self.perimiter
 
     def discount_price(self):
-        return self.area() * self.number_of_sides()
-
-    def area(self):
-        return len(self.plants)
-
-    def perimiter(self):
-        return sum(plant.perimiter_contribution() for plant in self.plants)
-
-    def number_of_sides(self):
-        left = (-1, 0)
-        right = (1, 0)
-        up = (0, -1)
-        down = (0, 1)
-        directions = {
-            "left": Sides(up, down),
-            "right": Sides(up, down),
-            "up": Sides(left, right),
-            "down": Sides(left, right),
-        }
-        for plant in self.plants:
-            for direction, point in plant.perimiter():
-                directions[direction].add(point)
-        return sum(sides.count() for sides in directions.values())
-
-
-class Sides:
-
-    def __init__(self, back, forward):
-        self.points = []
-        self.back = back
-        self.forward = forward
-
-    def add(self, point):
-        self.points.append(point)
-
-    def count(self):
-        left = list(self.points)
-        count = 0
-        while left:
-            point = left.pop(0)
-            back = point.move(*self.back)
-            while back in left:
-                left.remove(back)
-                back = back.move(*self.back)
-            forward = point.move(*self.forward)
-            while forward in left:
-                left.remove(forward)
-                forward = forward.move(*self.forward)
-            count += 1
-        return count
-
-
-class Plant:
-
-    def __init__(self, point, plant, garden):
-        self.point = point
-        self.plant = plant
-        self.garden = garden
-
-    def perimiter_contribution(self):
-        return len(self.perimiter())
-
-    def perimiter(self):
-        return [
-            (direction, self.point)
-            for direction, point in self.point.all_directions()
-            if not self.garden.get(point).is_plant(self.plant)
-        ]
-
-    def mark_visited(self, visited):
-        visited.add(self.point)
-
-    def is_plant(self, plant):
-        return self.plant == plant
-
-    def region(self):
-        region = Region()
-        to_visit = [self.point]
-        visited = set()
-        while to_visit:
-            point = to_visit.pop()
-            if point not in visited:
-                region.add(self.garden.get(point))
-                visited.add(point)
-                to_visit.extend(
-                    [
-                        point
-                        for direction, point in point.all_directions()
-                        if self.garden.get(point).is_plant(self.plant)
-                    ]
-                )
-        return region
-
-
-class NoPlant:
-
-    def is_plant(self, plant):
-        return False
-
-
-class Point(collections.namedtuple("Point", ["x", "y"])):
-
-    def move(self, dx=0, dy=0):
-        return Point(x=self.x + dx, y=self.y + dy)
-
-    def all_directions(self):
-        return self.vertical_directions() + self.horizontal_directions()
-
-    def vertical_directions(self):
-        return [
-            ("down", self.move(dy=1)),
-            ("up", self.move(dy=-1)),
-        ]
-
-    def horizontal_directions(self):
-        return [
-            ("right", self.move(dx=1)),
-            ("left", self.move(dx=-1)),
-        ]
+        return self.area * self.sides
 
 
 doctest.testmod()
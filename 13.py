@@ -24,48 +24,74 @@ class ClawMachines:
 
     @classmethod
     def load_text(cls, text):
-        claw_machines = cls()
-        lines = text.splitlines()
-        while lines:
-            claw_machines.add(ClawMachine.from_lines(lines))
-            while lines and lines[0].strip() == "":
-                lines.pop(0)
-        return claw_machines
+        """
+        All numbers are extracted at once and stored column wise.
+
+        >>> claw_machines = ClawMachines.load_text('''
+        ... Button A: X+94, Y+34
+        ... Button B: X+22, Y+67
+        ... Prize: X=8400, Y=5400
+        ...
+        ... Button A: X+26, Y+66
+        ... Button B: X+67, Y+21
+        ... Prize: X=12748, Y=12176
+        ... ''')
+        >>> claw_machines.prize_x
+        [8400, 12748]
+        >>> list(claw_machines.machines())
+        [ClawMachine(a=Point(x=94, y=34), b=Point(x=22, y=67), prize=Point(x=8400, y=5400)), ClawMachine(a=Point(x=26, y=66), b=Point(x=67, y=21), prize=Point(x=12748, y=12176))]
+        >>> claw_machines.total_token_prices_for_wins()
+        280
+        """
+        numbers = [int(number) for number in re.findall(r"\d+", text)]
+        return cls(*[numbers[column::6] for column in range(6)])
 
-    def __init__(self):
-        self.machines = []
+    def __init__(self, a_x=(), a_y=(), b_x=(), b_y=(), prize_x=(), prize_y=()):
+        self.a_x = list(a_x)
+        self.a_y = list(a_y)
+        self.b_x = list(b_x)
+        self.b_y = list(b_y)
+        self.prize_x = list(prize_x)
+        self.prize_y = list(prize_y)
 
     def increase_prize_distance(self, distance):
-        for machine in self.machines:
-            machine.increase_prize_distance(distance)
+        self.prize_x = [x + distance for x in self.prize_x]
+        self.prize_y = [y + distance for y in self.prize_y]
         return self
 
     def add(self, claw_machine):
-        self.machines.append(claw_machine)
+        self.a_x.append(claw_machine.a.x)
+        self.a_y.append(claw_machine.a.y)
+        self.b_x.append(claw_machine.b.x)
+        self.b_y.append(claw_machine.b.y)
+        self.prize_x.append(claw_machine.prize.x)
+        self.prize_y.append(claw_machine.prize.y)
+
+    def machines(self):
+        for a_x, a_y, b_x, b_y, prize_x, prize_y in self.columns():
+            yield ClawMachine(
+                a=Point(a_x, a_y), b=Point(b_x, b_y), prize=Point(prize_x, prize_y)
+            )
+
+    def columns(self):
+        return zip(self.a_x, self.a_y, self.b_x, self.b_y, self.prize_x, self.prize_y)
 
     def total_token_prices_for_wins(self):
-        return sum(machine.token_prizes_for_win() for machine in self.machines)
+        return sum(
+            map(
+                ClawMachine.token_prizes,
+                self.a_x,
+                self.a_y,
+                self.b_x,
+                self.b_y,
+                self.prize_x,
+                self.prize_y,
+            )
+        )
 
 
 class ClawMachine:
 
-    @classmethod
-    def from_lines(cls, lines):
-        a_regex = r"Button A: X[+](\d+), Y[+](\d+)"
-        b_regex = r"Button B: X[+](\d+), Y[+](\d+)"
-        prize_regex = r"Prize: X=(\d+), Y=(\d+)"
-        a_line = lines.pop(0)
-        b_line = lines.pop(0)
-        price_line = lines.pop(0)
-        a_match = re.match(a_regex, a_line)
-        b_match = re.match(b_regex, b_line)
-        prize_match = re.match(prize_regex, price_line)
-        return ClawMachine(
-            a=Point.from_re_match(a_match),
-            b=Point.from_re_match(b_match),
-            prize=Point.from_re_match(prize_match),
-        )
-
     def __init__(self, a, b, prize):
         self.a = a
         self.b = b
@@ -75,37 +101,111 @@ class ClawMachine:
         self.prize = self.prize.move(dx=distance, dy=distance)
 
     def token_prizes_for_win(self):
-        """
-        Equation 1:
+        return self.token_prizes(
+            self.a.x, self.a.y, self.b.x, self.b.y, self.prize.x, self.prize.y
+        )
 
-        a*self.a.x + b*self.b.x == self.price.x
+    @classmethod
+    def token_prizes(cls, a_x, a_y, b_x, b_y, prize_x, prize_y):
+        """
+        Solve with Cramer's rule:
 
-        a = (self.price.x - b*self.b.x) / self.a.x
+        a*a_x + b*b_x == prize_x
+        a*a_y + b*b_y == prize_y
 
-        Equation 2:
+        >>> ClawMachine.token_prizes(94, 34, 22, 67, 8400, 5400)
+        280
+        >>> ClawMachine.token_prizes(26, 66, 67, 21, 12748, 12176)
+        0
 
-        a*self.a.y + b*self.b.y == self.price.y
+        If the buttons move in the same direction, there is no single
+        solution:
 
-        b = (self.price.y - a*self.a.y) / self.b.y
+        >>> ClawMachine.token_prizes(2, 4, 3, 6, 12, 24)
+        4
         """
-        b_top = self.prize.y * self.a.x - self.prize.x * self.a.y
-        b_bottom = self.a.x * self.b.y - self.b.x * self.a.y
-        if b_top % b_bottom == 0:
-            b = b_top // b_bottom
-            a_top = self.prize.x - b * self.b.x
-            a_bottom = self.a.x
-            if a_top % a_bottom == 0:
-                a = a_top // a_bottom
-                if a >= 0 and b >= 0:
-                    return a * 3 + b
+        determinant = a_x * b_y - b_x * a_y
+        if determinant == 0:
+            return cls.token_prizes_collinear(a_x, a_y, b_x, b_y, prize_x, prize_y)
+        a, a_rest = divmod(prize_x * b_y - prize_y * b_x, determinant)
+        b, b_rest = divmod(prize_y * a_x - prize_x * a_y, determinant)
+        if a_rest == 0 and b_rest == 0 and a >= 0 and b >= 0:
+            return a * 3 + b
         return 0
 
+    @classmethod
+    def token_prizes_collinear(cls, a_x, a_y, b_x, b_y, prize_x, prize_y):
+        """
+        All movement is along one line, so the prize must be on it, and only
+        one of the equations needs to be solved.
+
+        >>> ClawMachine.token_prizes_collinear(2, 4, 3, 6, 12, 25)
+        0
+        >>> ClawMachine.token_prizes_collinear(0, 0, 3, 6, 12, 24)
+        4
+        >>> ClawMachine.token_prizes_collinear(0, 0, 0, 0, 0, 0)
+        0
+        """
+        direction_x, direction_y = (a_x, a_y) if (a_x, a_y) != (0, 0) else (b_x, b_y)
+        if direction_x * prize_y - direction_y * prize_x != 0:
+            return 0
+        if direction_x != 0:
+            return cls.cheapest_combination(a_x, b_x, prize_x)
+        else:
+            return cls.cheapest_combination(a_y, b_y, prize_y)
+
+    @staticmethod
+    def cheapest_combination(a_step, b_step, distance):
+        """
+        Find a >= 0 and b >= 0 such that a*a_step + b*b_step == distance with
+        the lowest cost a*3 + b.
+
+        With the extended Euclidean algorithm, all solutions can be written
+        as a = a0 + k*(b_step/g) and b = b0 - k*(a_step/g). The cost is linear
+        in k, so the cheapest solution is at one end of the range of k that
+        keeps both a and b non-negative.
+
+        >>> ClawMachine.cheapest_combination(2, 3, 12)
+        4
+        >>> ClawMachine.cheapest_combination(4, 6, 13)
+        0
+        >>> ClawMachine.cheapest_combination(10, 1, 25)
+        11
+        >>> ClawMachine.cheapest_combination(1, 2, 25)
+        15
+        >>> ClawMachine.cheapest_combination(100, 1, 10**13)
+        300000000000
+        >>> ClawMachine.cheapest_combination(100, 0, 10**13)
+        300000000000
+        """
+        if a_step == 0 and b_step == 0:
+            return 0
+        gcd, x, y = extended_gcd(a_step, b_step)
+        if distance % gcd != 0:
+            return 0
+        if b_step == 0:
+            return distance // a_step * 3
+        if a_step == 0:
+            return distance // b_step
+        a_period = b_step // gcd
+        b_period = a_step // gcd
+        a0 = x * (distance // gcd)
+        b0 = y * (distance // gcd)
+        lowest_k = -(a0 // a_period)
+        highest_k = b0 // b_period
+        if lowest_k > highest_k:
+            return 0
+        if 3 * a_period - b_period > 0:
+            k = lowest_k
+        else:
+            k = highest_k
+        return (a0 + k * a_period) * 3 + (b0 - k * b_period)
+
+    def __repr__(self):
+        return f"ClawMachine(a={self.a!r}, b={self.b!r}, prize={self.prize!r})"
 
-class Point(collections.namedtuple("Point", ["x", "y"])):
 
-    @classmethod
-    def from_re_match(cls, re_match):
-        return cls(*[int(x) for x in re_match.groups()])
+class Point(collections.namedtuple("Point", ["x", "y"])):
 
     def is_less_than(self, other):
         return self.x < other.x and self.y < other.y
@@ -117,5 +217,22 @@ class Point(collections.namedtuple("Point", ["x", "y"])):
         return Point(x=self.x + dx, y=self.y + dy)
 
 
+def extended_gcd(a, b):
+    """
+    Return (g, x, y) such that a*x + b*y == g == gcd(a, b).
+
+    >>> extended_gcd(240, 46)
+    (2, -9, 47)
+    """
+    x, last_x = 0, 1
+    y, last_y = 1, 0
+    while b != 0:
+        quotient, rest = divmod(a, b)
+        a, b = b, rest
+        x, last_x = last_x - quotient * x, x
+        y, last_y = last_y - quotient * y, y
+    return a, last_x, last_y
+
+
 doctest.testmod()
 print("OK")
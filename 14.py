@@ -17,11 +17,16 @@ Part 1:
 
 Part 2:
 
->>> Robots.load().elapse(6243).print()
+>>> Robots.load().find_christmas_tree()
+6243
 """
 
 import collections
+import concurrent.futures
 import doctest
+import math
+import os
+import struct
 
 
 class Robots:
@@ -40,42 +45,113 @@ class Robots:
         )
 
     def __init__(self, robots, width, height):
-        self.robots = list(robots)
         self.width = width
         self.height = height
+        self.x = []
+        self.y = []
+        self.dx = []
+        self.dy = []
+        for robot in robots:
+            self.add(robot)
+
+    def find_christmas_tree(self, processes=None):
+        """
+        In the christmas tree frame, the robots are clustered, so the
+        variance of their positions is unusually low. The x positions repeat
+        every width seconds and the y positions every height seconds,
+        independently of each other. So the best x and y times are found
+        separately and combined with the chinese remainder theorem. That
+        checks every frame in the full period with only width + height
+        variance computations.
+
+        The scans can be spread over multiple processes:
+
+        >>> Robots.load().find_christmas_tree(processes=3)
+        6243
+
+        When width and height share a factor, the best x and y times might
+        not happen together. Then the frame with the lowest combined
+        variance in the full period is found instead:
+
+        >>> Robots.load_text("\\n".join([
+        ...     "p=0,0 v=1,0",
+        ...     "p=3,0 v=-1,0",
+        ...     "p=0,0 v=0,1",
+        ...     "p=0,5 v=0,0",
+        ... ]), 4, 6).find_christmas_tree()
+        2
+        """
+        x_spreads, y_spreads = self.spreads(processes)
+        x_time = x_spreads.index(min(x_spreads))
+        y_time = y_spreads.index(min(y_spreads))
+        if (y_time - x_time) % math.gcd(self.width, self.height) == 0:
+            return chinese_remainder(x_time, self.width, y_time, self.height)
+        return min(
+            range(math.lcm(self.width, self.height)),
+            key=lambda seconds: x_spreads[seconds % self.width]
+            + y_spreads[seconds % self.height],
+        )
 
-    def find_christmas_tree_iterations(self):
-        iterations = 0
-        while not self.is_christmas_tree():
-            self.elapse(1)
-            iterations += 1
-        self.print()
-        return iterations
-
-    def is_christmas_tree(self):
-        return True
-
-    def draw(self, context):
-        size = 3
-        counts = {}
-        for robot in self.robots:
-            counts[robot.position] = counts.get(robot.position, 0) + 1
-        for y in range(self.height):
-            chars = []
-            for x in range(self.width):
-                point = Point(x, y)
-                if point in counts:
-                    context.rectangle(x * size, y * size, size, size)
-                    context.fill()
+    def spreads(self, processes=None):
+        """
+        The spread of the x positions for every second in one x period, and
+        of the y positions for every second in one y period.
+        """
+        axes = [(self.x, self.dx, self.width), (self.y, self.dy, self.height)]
+        if not processes:
+            return [
+                spreads(positions, velocities, size, range(size))
+                for positions, velocities, size in axes
+            ]
+        tasks = []
+        for axis, (_, _, size) in enumerate(axes):
+            chunk_size = max(1, -(-size // processes))
+            for start in range(0, size, chunk_size):
+                tasks.append((axis, range(start, min(start + chunk_size, size))))
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            chunks = executor.map(
+                spreads,
+                [axes[axis][0] for axis, _ in tasks],
+                [axes[axis][1] for axis, _ in tasks],
+                [axes[axis][2] for axis, _ in tasks],
+                [seconds for _, seconds in tasks],
+            )
+            result = [[] for _ in axes]
+            for (axis, _), chunk in zip(tasks, chunks):
+                result[axis].extend(chunk)
+        return result
+
+    def bitmap(self):
+        """
+        Packed 1-bit rows, most significant bit first, as in PBM files.
+
+        >>> Robots.load_text("p=0,0 v=0,0\\np=9,1 v=0,0", 11, 2).bitmap()
+        b'\\x80\\x00\\x00@'
+        """
+        row_bytes = (self.width + 7) // 8
+        bitmap = bytearray(row_bytes * self.height)
+        for x, y in self.positions():
+            bitmap[y * row_bytes + (x >> 3)] |= 0x80 >> (x & 7)
+        return bytes(bitmap)
+
+    def pixels(self):
+        """
+        One byte per pixel: 1 where there is a robot, 0 elsewhere.
+
+        >>> Robots.load_text("p=0,0 v=0,0\\np=2,1 v=0,0", 3, 2).pixels()
+        b'\\x01\\x00\\x00\\x00\\x00\\x01'
+        """
+        pixels = bytearray(self.width * self.height)
+        for x, y in self.positions():
+            pixels[y * self.width + x] = 1
+        return bytes(pixels)
 
     def print(self):
-        counts = {}
-        for robot in self.robots:
-            counts[robot.position] = counts.get(robot.position, 0) + 1
+        counts = collections.Counter(self.positions())
         for y in range(self.height):
             chars = []
             for x in range(self.width):
-                point = Point(x, y)
+                point = (x, y)
                 if point in counts:
                     if counts[point] <= 9:
                         chars.append(str(counts[point]))
@@ -86,37 +162,70 @@ class Robots:
             print("".join(chars))
 
     def add(self, robot):
-        self.robots.append(robot)
+        self.x.append(robot.position.x)
+        self.y.append(robot.position.y)
+        self.dx.append(robot.velocity.x)
+        self.dy.append(robot.velocity.y)
+
+    def positions(self):
+        return zip(self.x, self.y)
 
     def elapse(self, seconds):
-        for robot in self.robots:
-            robot.elapse(seconds, self.width, self.height)
+        """
+        Positions are computed in closed form, so any number of seconds is
+        equally fast:
+
+        >>> robots = Robots.load_text("p=2,4 v=2,-3", 11, 7)
+        >>> list(robots.elapse(5).positions())
+        [(1, 3)]
+        >>> list(robots.elapse(77 * 10**30).positions())
+        [(1, 3)]
+        """
+        width = self.width
+        height = self.height
+        self.x = [(x + dx * seconds) % width for x, dx in zip(self.x, self.dx)]
+        self.y = [(y + dy * seconds) % height for y, dy in zip(self.y, self.dy)]
         return self
 
     def count_repetitive(self):
+        """
+        A robot is back where it started when both its x and y are.
+        """
         return set(
-            [robot.count_repetitive(self.width, self.height) for robot in self.robots]
+            math.lcm(
+                self.width // math.gcd(dx, self.width),
+                self.height // math.gcd(dy, self.height),
+            )
+            for dx, dy in zip(self.dx, self.dy)
         )
 
-    def quadrants(self):
-        XXX = Rectangle(Point(0, 0), Point(self.width, self.height))
-        quadrants = {}
-        for quadrant in XXX.get_quadrants():
-            quadrants[quadrant] = Robots([], self.width, self.height)
-        for robot in self.robots:
-            for quadrant, robots in quadrants.items():
-                if robot.inside(quadrant):
-                    robots.add(robot)
-        return list(quadrants.values())
+    def quadrant_counts(self):
+        """
+        >>> Robots.load_text("\\n".join([
+        ...     "p=0,0 v=0,0",
+        ...     "p=1,0 v=0,0",
+        ...     "p=2,2 v=0,0",
+        ...     "p=4,1 v=0,0",
+        ...     "p=0,4 v=0,0",
+        ...     "p=4,4 v=0,0",
+        ... ]), 5, 5).quadrant_counts()
+        [2, 1, 1, 1]
+        """
+        assert self.width % 2 == 1
+        assert self.height % 2 == 1
+        middle_x = self.width // 2
+        middle_y = self.height // 2
+        counts = [0, 0, 0, 0]
+        for x, y in self.positions():
+            if x != middle_x and y != middle_y:
+                counts[(x > middle_x) + 2 * (y > middle_y)] += 1
+        return counts
 
     def count_robots(self):
-        return len(self.robots)
+        return len(self.x)
 
     def safety_factor(self):
-        product = 1
-        for quadrant in self.quadrants():
-            product *= quadrant.count_robots()
-        return product
+        return math.prod(self.quadrant_counts())
 
 
 class Robot:
@@ -137,52 +246,10 @@ class Robot:
         self.position = position
         self.velocity = velocity
 
-    def inside(self, quadrant):
-        return quadrant.contains(self.position)
-
-    def elapse(self, seconds, width, height):
-        for _ in range(seconds):
-            self.position = self.position.add(self.velocity).wrap(width, height)
-
-    def count_repetitive(self, width, height):
-        position = self.position
-        count = 0
-        while True:
-            position = position.add(self.velocity).wrap(width, height)
-            count += 1
-            if position == self.position:
-                return count
-
     def __repr__(self):
         return f"Robot(position={self.position}, velocity={self.velocity!r}"
 
 
-class Rectangle(collections.namedtuple("Rectangle", ["start", "size"])):
-
-    def contains(self, point):
-        return (self.start.x <= point.x <= (self.start.x + self.size.x - 1)) and (
-            self.start.y <= point.y <= (self.start.y + self.size.y - 1)
-        )
-
-    def get_quadrants(self):
-        assert self.size.x % 2 == 1
-        assert self.size.y % 2 == 1
-        quadrant_size = Point(x=(self.size.x - 1) // 2, y=(self.size.y - 1) // 2)
-        return [
-            Rectangle(start=self.start, size=quadrant_size),
-            Rectangle(
-                start=self.start.move(dx=quadrant_size.x + 1), size=quadrant_size
-            ),
-            Rectangle(
-                start=self.start.move(dy=quadrant_size.y + 1), size=quadrant_size
-            ),
-            Rectangle(
-                start=self.start.move(dx=quadrant_size.x + 1, dy=quadrant_size.y + 1),
-                size=quadrant_size,
-            ),
-        ]
-
-
 class Point(collections.namedtuple("Point", ["x", "y"])):
 
     def add(self, other):
@@ -205,40 +272,143 @@ class Point(collections.namedtuple("Point", ["x", "y"])):
         return Point(x=new_x, y=new_y)
 
 
-def simulate():
-    x = {0: 0}
-
-    def draw(widget, context):
-        print(x[0])
-        context.set_source_rgb(1, 0.7, 1)
-        context.paint()
-        context.set_source_rgb(0, 0, 0)
-        robots.draw(context)
+def spreads(positions, velocities, size, seconds_range):
+    """
+    The variance of the positions along one axis after each of the given
+    seconds, times the number of positions squared.
+
+    >>> spreads([0, 4], [1, -1], 5, range(5))
+    [16, 4, 0, 4, 16]
+    """
+    count = len(positions)
+    result = []
+    for seconds in seconds_range:
+        moved = [
+            (position + velocity * seconds) % size
+            for position, velocity in zip(positions, velocities)
+        ]
+        total = sum(moved)
+        result.append(
+            count * sum(position * position for position in moved) - total * total
+        )
+    return result
+
+
+def chinese_remainder(a, m, b, n):
+    """
+    Find the smallest t >= 0 such that t % m == a and t % n == b.
+
+    >>> chinese_remainder(2, 3, 3, 5)
+    8
+    >>> chinese_remainder(3, 4, 1, 6)
+    7
+    """
+    gcd = math.gcd(m, n)
+    assert (b - a) % gcd == 0
+    steps = (b - a) // gcd * pow(m // gcd, -1, n // gcd) % (n // gcd)
+    return a + m * steps
+
+
+def write_pbm_frames(robots, directory, count):
+    """
+    Write count frames, one second apart, as numbered PBM files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    header = f"P4\n{robots.width} {robots.height}\n".encode("ascii")
+    for frame in range(count):
+        with open(os.path.join(directory, f"{frame:05}.pbm"), "wb") as f:
+            f.write(header)
+            f.write(robots.bitmap())
         robots.elapse(1)
-        x[0] += 1
-        canvas.queue_draw()
-        import time
-
-        time.sleep(4.9)
-
-    import gi
-
-    gi.require_version("Gtk", "3.0")
-    from gi.repository import Gtk
-    from gi.repository import Gdk
-
-    robots = Robots.load()
-    robots.elapse(6243)
-
-    window = Gtk.Window()
-    window.connect("destroy", Gtk.main_quit)
-    canvas = Gtk.DrawingArea()
-    canvas.connect("draw", draw)
-    window.add(canvas)
-    window.show_all()
-    Gtk.main()
 
 
-doctest.testmod()
-print("OK")
-# simulate()
+def write_gif(robots, path, count, delay=10):
+    """
+    Write count frames, one second apart, as a looping animated GIF. The
+    delay between frames is in hundredths of a second.
+    """
+    with open(path, "wb") as f:
+        f.write(b"GIF89a")
+        f.write(struct.pack("<HHBBB", robots.width, robots.height, 0x80, 0, 0))
+        f.write(b"\xff\xff\xff\x00\x00\x00")
+        f.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+        for frame in range(count):
+            f.write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0, delay, 0, 0))
+            f.write(struct.pack("<BHHHHB", 0x2C, 0, 0, robots.width, robots.height, 0))
+            f.write(b"\x02")
+            data = lzw_encode(robots.pixels())
+            for start in range(0, len(data), 255):
+                block = data[start : start + 255]
+                f.write(bytes([len(block)]))
+                f.write(block)
+            f.write(b"\x00")
+            robots.elapse(1)
+        f.write(b"\x3b")
+
+
+def lzw_encode(pixels):
+    """
+    GIF flavoured LZW for two colors (minimum code size 2), with codes packed
+    least significant bit first.
+
+    >>> lzw_encode(bytes([1, 1, 1, 1, 0]))
+    b'\\x8c\\x03\\x05'
+    """
+    clear_code = 4
+    end_code = 5
+    output = bytearray()
+    buffer = 0
+    buffer_bits = 0
+    code_size = 3
+    next_code = 6
+    table = {}
+    codes = [(clear_code, code_size)]
+    prefix = None
+    for pixel in pixels:
+        if prefix is None:
+            prefix = pixel
+            continue
+        key = (prefix << 2) | pixel
+        if key in table:
+            prefix = table[key]
+            continue
+        codes.append((prefix, code_size))
+        if next_code < 4096:
+            table[key] = next_code
+            next_code += 1
+            if next_code > 1 << code_size and code_size < 12:
+                code_size += 1
+        else:
+            codes.append((clear_code, code_size))
+            table = {}
+            code_size = 3
+            next_code = 6
+        prefix = pixel
+    if prefix is not None:
+        codes.append((prefix, code_size))
+    codes.append((end_code, code_size))
+    for code, size in codes:
+        buffer |= code << buffer_bits
+        buffer_bits += size
+        while buffer_bits >= 8:
+            output.append(buffer & 0xFF)
+            buffer >>= 8
+            buffer_bits -= 8
+    if buffer_bits:
+        output.append(buffer)
+    return bytes(output)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "render" in sys.argv[1:]:
+        robots = Robots.load()
+        count = math.lcm(*robots.count_repetitive())
+        if "gif" in sys.argv[1:]:
+            write_gif(robots, "14.gif", count)
+        else:
+            write_pbm_frames(robots, "14_frames", count)
+    else:
+        doctest.testmod()
+        print("OK")
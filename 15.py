@@ -40,8 +40,11 @@ Examples:
 
 import collections
 
+
 class Warehouse:
 
+    DOUBLE = {"#": "##", "O": "[]", ".": "..", "@": "@."}
+
     @classmethod
     def load(cls, double=False):
         with open("15.txt") as f:
@@ -49,203 +52,164 @@ class Warehouse:
 
     @classmethod
     def load_text(cls, text, double=False):
-        warehouse = cls()
         items, movements = text.split("\n\n")
-        for y, line in enumerate(items.splitlines()):
-            for x, item_type in enumerate(line):
-                if double:
-                    warehouse.add_double_item(x, y, item_type)
-                else:
-                    warehouse.add_item(x, y, item_type)
+        lines = items.splitlines()
+        if double:
+            lines = [
+                "".join(cls.DOUBLE[item_type] for item_type in line) for line in lines
+            ]
+        warehouse = cls(width=len(lines[0]), grid="".join(lines))
         for movement in movements:
             if movement.strip():
                 warehouse.add_robot_movement(movement)
         return warehouse
 
-    def __init__(self):
-        self.items = {}
-        self.robot = None
+    def __init__(self, width, grid):
+        self.width = width
+        self.grid = bytearray(grid.encode("ascii"))
+        self.robot = self.grid.index(b"@")
+        self.movements = collections.deque()
+        self.steps = {"<": -1, ">": 1, "^": -width, "v": width}
 
     def print(self):
-        for y in range(max(point.y for point in self.items)+1):
-            line = []
-            for x in range(max(point.x for point in self.items)+1):
-                line.append(self.get(Point(x, y)).grid_representation())
-            print("".join(line))
-
-    def get(self, point):
-        if point == self.robot.point:
-            return self.robot
-        else:
-            return self.items.get(point, Free())
-
-    def add_item(self, x, y, item_type):
-        point = Point(x, y)
-        if item_type == "@":
-            self.robot = Robot(point, self)
-        elif item_type == "#":
-            self.items[point] = Wall()
-        elif item_type == "O":
-            self.items[point] = Stone(point, self)
-        else:
-            assert item_type == "."
-
-    def add_double_item(self, x, y, item_type):
-        point = Point(x*2, y)
-        point_right = point.move(">")
-        if item_type == "@":
-            self.robot = Robot(point, self)
-        elif item_type == "#":
-            self.items[point] = Wall()
-            self.items[point_right] = Wall()
-        elif item_type == "O":
-            self.items[point] = LeftStone(point, self)
-            self.items[point_right] = RightStone(point_right, self)
-        else:
-            assert item_type == "."
+        for start in range(0, len(self.grid), self.width):
+            print(self.grid[start : start + self.width].decode("ascii"))
 
     def add_robot_movement(self, movement):
-        self.robot.add_movement(movement)
+        """
+        Movements are stored as runs of the same step.
+
+        >>> warehouse = Warehouse(width=3, grid="#@#")
+        >>> for movement in "<<<^>>":
+        ...     warehouse.add_robot_movement(movement)
+        >>> warehouse.movements
+        deque([[-1, 3], [-3, 1], [1, 2]])
+        """
+        step = self.steps[movement]
+        if self.movements and self.movements[-1][0] == step:
+            self.movements[-1][1] += 1
+        else:
+            self.movements.append([step, 1])
 
     def move_robot(self):
-        self.robot.move()
-        return self
-
-    def gps(self):
-        return sum(item.gps() for item in self.items.values())
-
-    def move_item(self, point, movement):
-        item = self.items[point]
-        del self.items[point]
-        new_point = point.move(movement)
-        item.warehouse_point_changed(new_point)
-        self.items[new_point] = item
-
-class Robot:
-
-    def __init__(self, point, warehouse):
-        self.point = point
-        self.warehouse = warehouse
-        self.movements = []
-
-    def grid_representation(self):
-        return "@"
-
-    def add_movement(self, movement):
-        self.movements.append(movement)
-
-    def move(self):
         while self.movements:
-            self.eval_movement(self.movements.pop(0))
-
-    def eval_movement(self, movement):
-        try:
-            pushed = set()
-            next_point = self.point.move(movement)
-            for item_point in self.warehouse.get(next_point).push(movement):
-                if item_point not in pushed:
-                    pushed.add(item_point)
-                    self.warehouse.move_item(item_point, movement)
-            self.point = next_point
-        except InvalidPush:
-            pass
-
-class Stone:
-
-    def __init__(self, point, warehouse):
-        self.point = point
-        self.warehouse = warehouse
-
-    def warehouse_point_changed(self, point):
-        self.point = point
-
-    def gps(self):
-        return self.point.gps()
-
-    def push(self, movement):
-        return self.warehouse.get(self.point.move(movement)).push(movement)+[self.point]
-
-class LeftStone:
-
-    def __init__(self, point, warehouse):
-        self.point = point
-        self.warehouse = warehouse
-
-    def warehouse_point_changed(self, point):
-        self.point = point
-
-    def grid_representation(self):
-        return "["
-
-    def gps(self):
-        return self.point.gps()
-
-    def push(self, movement):
-        push_point = self.point.move(movement)
-        stone_points = []
-        stone_points.extend(self.warehouse.get(push_point).push(movement))
-        if movement in "^v":
-            stone_points.extend(self.warehouse.get(push_point.move(">")).push(movement))
-        stone_points.extend([self.point, self.point.move(">")])
-        return stone_points
-
-class RightStone:
-
-    def __init__(self, point, warehouse):
-        self.point = point
-        self.warehouse = warehouse
-
-    def warehouse_point_changed(self, point):
-        self.point = point
-
-    def grid_representation(self):
-        return "]"
-
-    def gps(self):
-        return 0
-
-    def push(self, movement):
-        push_point = self.point.move(movement)
-        stone_points = []
-        stone_points.extend(self.warehouse.get(push_point).push(movement))
-        if movement in "^v":
-            stone_points.extend(self.warehouse.get(push_point.move("<")).push(movement))
-        stone_points.extend([self.point, self.point.move("<")])
-        return stone_points
-
-class Wall:
-
-    def grid_representation(self):
-        return "#"
-
-    def gps(self):
-        return 0
-
-    def push(self, movement):
-        raise InvalidPush()
-
-class Free:
-
-    def grid_representation(self):
-        return "."
-
-    def push(self, movement):
-        return []
-
-class Point(collections.namedtuple("Point", ["x", "y"])):
+            self.move(*self.movements.popleft())
+        return self
 
-    def move(self, movement):
-        dx = {"<": -1, ">": 1}.get(movement, 0)
-        dy = {"^": -1, "v": 1}.get(movement, 0)
-        return Point(x=self.x+dx, y=self.y+dy)
+    def move(self, step, count):
+        if not self.slide(step, count):
+            for _ in range(count):
+                if not self.move_vertically(step):
+                    break
+
+    def slide(self, step, count):
+        """
+        Move the robot count steps in a straight line at once. Every box in
+        the way ends up packed in front of the robot. Returns False if wide
+        boxes are pushed vertically, since they can push boxes beside the
+        line.
+
+        >>> warehouse = Warehouse(width=8, grid="#@O.O..#")
+        >>> warehouse.slide(1, 3)
+        True
+        >>> warehouse.print()
+        #...@OO#
+        >>> warehouse.slide(1, 10)
+        True
+        >>> warehouse.print()
+        #...@OO#
+        >>> warehouse.slide(-1, 2)
+        True
+        >>> warehouse.print()
+        #.@..OO#
+        """
+        grid = self.grid
+        end = self.robot
+        boxes = bytearray()
+        free = 0
+        while free < count:
+            item = grid[end + step]
+            if item == ord("#"):
+                break
+            end += step
+            if item == ord("."):
+                free += 1
+            elif item == ord("O") or step in (1, -1):
+                boxes.append(item)
+            else:
+                return False
+        grid[self.robot : end + step : step] = b"." * free + b"@" + boxes
+        self.robot += free * step
+        return True
+
+    def move_vertically(self, step):
+        """
+        Find all cells that would be pushed, one row of box fronts at a time,
+        then shift them, farthest row first.
+
+        >>> warehouse = Warehouse(width=8, grid="".join([
+        ...     "########",
+        ...     "#......#",
+        ...     "#.[][].#",
+        ...     "#..[]..#",
+        ...     "#..@...#",
+        ...     "########",
+        ... ]))
+        >>> warehouse.move_vertically(-8)
+        True
+        >>> warehouse.print()
+        ########
+        #.[][].#
+        #..[]..#
+        #..@...#
+        #......#
+        ########
+        >>> warehouse.move_vertically(-8)
+        False
+        >>> warehouse.print()
+        ########
+        #.[][].#
+        #..[]..#
+        #..@...#
+        #......#
+        ########
+        """
+        grid = self.grid
+        pushed = [self.robot]
+        front = [self.robot]
+        while front:
+            next_front = set()
+            for cell in front:
+                target = cell + step
+                item = grid[target]
+                if item == ord("#"):
+                    return False
+                elif item == ord("O"):
+                    next_front.add(target)
+                elif item == ord("["):
+                    next_front.add(target)
+                    next_front.add(target + 1)
+                elif item == ord("]"):
+                    next_front.add(target)
+                    next_front.add(target - 1)
+            pushed.extend(next_front)
+            front = next_front
+        for cell in reversed(pushed):
+            grid[cell + step] = grid[cell]
+            grid[cell] = ord(".")
+        self.robot += step
+        return True
 
     def gps(self):
-        return 100*self.y + self.x
+        return sum(
+            100 * (index // self.width) + index % self.width
+            for index, item in enumerate(self.grid)
+            if item in b"O["
+        )
 
-class InvalidPush(Exception):
-    pass
 
 if __name__ == "__main__":
     import doctest
+
     doctest.testmod()
     print("OK")
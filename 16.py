@@ -58,10 +58,12 @@ empty = [
     "###############",
 ]
 
-import collections
+import heapq
+import io
 import sys
 import time
 
+
 class MazeParser:
 
     def parse(self):
@@ -69,220 +71,312 @@ class MazeParser:
             return self.parse_lines(f.read().splitlines())
 
     def parse_lines(self, lines):
-        maze = Maze()
-        for y, row in enumerate(lines):
-            for x, tile in enumerate(row):
-                point = Point(x=x, y=y)
-                if tile == "#":
-                    maze.add_wall(point)
-                elif tile == "S":
-                    maze.mark_start(point, Direction.east())
-                elif tile == "E":
-                    maze.mark_end(point)
-                else:
-                    assert tile == "."
-        return maze
+        width = len(lines[0])
+        tiles = "".join(lines)
+        assert set(tiles) <= set("#.SE")
+        return Maze(
+            width=width,
+            free=bytearray(tile != "#" for tile in tiles),
+            start=tiles.index("S"),
+            end=tiles.index("E"),
+        )
+
 
 class Maze:
+    """
+    Tiles are indexed row by row. The free array holds 1 for tiles that can
+    be walked on.
+    """
 
-    def __init__(self):
-        self.start = None
-        self.end = None
-        self.walls = set()
-
-    def add_wall(self, point):
-        self.walls.add(point)
-
-    def mark_start(self, point, direction):
-        self.start = Reindeer(point=point, direction=direction)
-
-    def mark_end(self, point):
-        self.end = point
-
-    def is_free(self, point):
-        return point not in self.walls
-
-    def is_end(self, point):
-        return point == self.end
-
-    def print(self, trail=[]):
-        for row in self.max_point().rows():
-            line = []
-            for point in row.columns():
-                if point in trail:
-                    line.append(".")
-                elif point in self.walls:
-                    line.append("#")
-                elif point == self.end:
-                    line.append("E")
-                elif point == self.start.point:
-                    line.append("S")
-                else:
-                    line.append(" ")
-            print("".join(line))
-
-    def max_point(self):
-        max_point = Point(x=0, y=0)
-        for point in list(self.walls) + [self.start.point, self.end]:
-            max_point = max_point.max(point)
-        return max_point
+    EAST = 0
+    SOUTH = 1
+    WEST = 2
+    NORTH = 3
+
+    def __init__(self, width, free, start, end):
+        self.width = width
+        self.free = free
+        self.start = start
+        self.end = end
+        self.offsets = [1, width, -1, -width]
+
+    def print(self, trail=()):
+        print(self.render(trail), end="")
+
+    def render(self, trail=()):
+        trail = set(trail)
+        lines = []
+        for row_start in range(0, len(self.free), self.width):
+            lines.append(
+                "".join(
+                    "." if tile in trail else self.tile_char(tile)
+                    for tile in range(row_start, row_start + self.width)
+                )
+            )
+        return "".join(line + "\n" for line in lines)
+
+    def tile_char(self, tile):
+        if not self.free[tile]:
+            return "#"
+        elif tile == self.end:
+            return "E"
+        elif tile == self.start:
+            return "S"
+        else:
+            return " "
 
     def solve(self, interactive=False):
-        assert self.start is not None
-        assert self.end is not None
-        return ReindeerSearch(
-            maze=self,
-            reindeer=self.start,
-        ).find_all(interactive)
-
-class Reindeer(collections.namedtuple("Reindeer", ["point", "direction"])):
-
-    def moves(self, maze):
-        return [
-            move
-            for move in [
-                Move(cost=1000, reindeer=self.rotate_clockwise()),
-                Move(cost=1000, reindeer=self.rotate_counterclockwise()),
-                Move(cost=1, reindeer=self.walk()),
-            ]
-            if move.is_possible(maze)
-        ]
-
-    def is_end(self, maze):
-        return maze.is_end(self.point)
-
-    def on_free_spot(self, maze):
-        return maze.is_free(self.point)
-
-    def rotate_clockwise(self):
-        return self._replace(
-            direction=self.direction.rotate_clockwise(),
-        )
+        if interactive:
+            observer = TerminalRenderer(self)
+        else:
+            observer = SearchObserver()
+        return ReindeerSearch(graph=CorridorGraph(self), observer=observer).find_all()
 
-    def rotate_counterclockwise(self):
-        return self._replace(
-            direction=self.direction.rotate_counterclockwise(),
-        )
 
-    def walk(self):
-        return self._replace(
-            point=self.direction.move(self.point),
-        )
+class CorridorGraph:
+    """
+    The maze contracted to junctions, dead ends, start, and end. An edge
+    follows a corridor from one node to the next and costs one per step plus
+    1000 per bend.
 
-class Move:
+    >>> graph = CorridorGraph(MazeParser().parse_lines(small))
+    >>> len(graph.edges) < sum(graph.maze.free)
+    True
+    """
 
-    def __init__(self, cost, reindeer):
-        self.cost = cost
-        self.reindeer = reindeer
+    def __init__(self, maze):
+        self.maze = maze
+        self.nodes = bytearray(len(maze.free))
+        for tile, free in enumerate(maze.free):
+            if free:
+                self.nodes[tile] = (
+                    tile in (maze.start, maze.end)
+                    or sum(maze.free[tile + offset] for offset in maze.offsets) != 2
+                )
+        self.edges = {}
+        for tile, node in enumerate(self.nodes):
+            if node:
+                self.edges[tile] = [
+                    self.follow_corridor(tile, direction)
+                    for direction, offset in enumerate(maze.offsets)
+                    if maze.free[tile + offset]
+                ]
+
+    def follow_corridor(self, node, direction):
+        """
+        Returns (direction, arrival direction, target node, cost, tiles).
+
+        >>> graph = CorridorGraph(MazeParser().parse_lines(small))
+        >>> direction, arrival, target, cost, tiles = graph.follow_corridor(
+        ...     graph.maze.start, Maze.NORTH
+        ... )
+        >>> direction, arrival, cost, len(tiles)
+        (3, 3, 2, 2)
+        """
+        offsets = self.maze.offsets
+        tile = node + offsets[direction]
+        arrival = direction
+        cost = 1
+        tiles = [tile]
+        while not self.nodes[tile]:
+            for turn, turn_cost in [(0, 1), (1, 1001), (3, 1001)]:
+                next_direction = (arrival + turn) % 4
+                if self.maze.free[tile + offsets[next_direction]]:
+                    break
+            arrival = next_direction
+            cost += turn_cost
+            tile += offsets[arrival]
+            tiles.append(tile)
+        return (direction, arrival, tile, cost, tuple(tiles))
 
-    def is_possible(self, maze):
-        return self.reindeer.on_free_spot(maze)
 
 class ReindeerSearch:
-
-    GOAL = None
-
-    def __init__(self, maze, reindeer):
-        self.maze = maze
-        self.fringe = [reindeer]
-        self.cost = {reindeer: 0}
-        self.came_from = {reindeer: []}
-
-    def find_all(self, interactive):
+    """
+    Dijkstra over reindeer states encoded as node * 4 + direction.
+
+    All predecessors on a cheapest path to a state are kept together with
+    the corridor leading from them, so the states form a DAG that contains
+    every best path.
+    """
+
+    TURN_COSTS = [0, 1000, 2000, 1000]
+
+    def __init__(self, graph, observer=None):
+        self.graph = graph
+        self.maze = graph.maze
+        self.observer = SearchObserver() if observer is None else observer
+        start = self.maze.start * 4 + Maze.EAST
+        self.fringe = [(0, start)]
+        self.cost = {start: 0}
+        self.came_from = {start: []}
+        self.goals = []
+
+    def find_all(self):
         while self.fringe:
-            reindeer = self.fringe.pop(0)
-            if interactive:
-                self.maze.print(trail=self.trail(reindeer))
-                time.sleep(0.1)
-            self.process(reindeer)
-        if interactive:
-            self.maze.print(trail=self.trail(self.GOAL))
-        return Solution(
-            trail=self.trail(self.GOAL),
-            cost=self.cost[self.GOAL],
+            cost, state = heapq.heappop(self.fringe)
+            if cost > self.cost[state]:
+                continue
+            if self.goals and cost > self.cost[self.goals[0]]:
+                break
+            self.observer.state_popped(self, state)
+            self.process(cost, state)
+        solution = Solution(
+            trail=self.trail(self.goals),
+            cost=self.cost[self.goals[0]],
         )
-
-    def process(self, reindeer):
-        if reindeer == self.GOAL:
-            pass
-        else:
-            if reindeer.is_end(self.maze):
-                moves = [Move(cost=0, reindeer=self.GOAL)]
-            else:
-                moves = reindeer.moves(self.maze)
-            for move in moves:
-                neighbour = move.reindeer
-                move_cost = self.cost[reindeer] + move.cost
-                if self.GOAL in self.cost and move_cost > self.cost[self.GOAL]:
-                    pass
-                elif neighbour not in self.cost:
-                    self.came_from[neighbour] = [reindeer]
-                    self.cost[neighbour] = move_cost
-                    self.fringe.append(neighbour)
-                    self.fringe.sort(key=lambda x: self.cost[x])
-                elif move_cost < self.cost[neighbour]:
-                    self.came_from[neighbour].append(reindeer)
-                    self.cost[neighbour] = move_cost
-                    self.fringe.append(neighbour)
-                    self.fringe.sort(key=lambda x: self.cost[x])
-                elif move_cost <= self.cost[neighbour]:
-                    self.came_from[neighbour].append(reindeer)
-
-    def trail(self, reindeer):
-        trail = set()
-        if reindeer != self.GOAL:
-            trail.add(reindeer.point)
-        for previous in self.came_from.get(reindeer, []):
-            trail |= self.trail(previous)
+        self.observer.search_done(self, solution)
+        return solution
+
+    def process(self, cost, state):
+        node, facing = divmod(state, 4)
+        if node == self.maze.end:
+            self.goals.append(state)
+            self.observer.goal_found(self, state)
+            return
+        for direction, arrival, target, edge_cost, tiles in self.graph.edges[node]:
+            neighbour = target * 4 + arrival
+            neighbour_cost = (
+                cost + self.TURN_COSTS[(direction - facing) % 4] + edge_cost
+            )
+            if neighbour_cost < self.cost.get(neighbour, neighbour_cost + 1):
+                self.cost[neighbour] = neighbour_cost
+                self.came_from[neighbour] = [(state, tiles)]
+                heapq.heappush(self.fringe, (neighbour_cost, neighbour))
+                self.observer.state_relaxed(self, neighbour, tiles)
+            elif neighbour_cost == self.cost[neighbour]:
+                self.came_from[neighbour].append((state, tiles))
+                self.observer.state_relaxed(self, neighbour, tiles)
+
+    def trail(self, states):
+        """
+        Tiles of all states on a cheapest path to any of the given states,
+        found with an iterative walk backwards through the predecessors and
+        expanded with the corridors between them.
+        """
+        trail = {state // 4 for state in states}
+        visited = set(states)
+        to_visit = list(states)
+        while to_visit:
+            for previous, tiles in self.came_from[to_visit.pop()]:
+                trail.update(tiles)
+                if previous not in visited:
+                    trail.add(previous // 4)
+                    visited.add(previous)
+                    to_visit.append(previous)
         return trail
 
+
 class Solution:
 
     def __init__(self, trail, cost):
         self.trail = trail
         self.cost = cost
 
-class Point(collections.namedtuple("Point", ["x", "y"])):
 
-    def max(self, other):
-        return Point(x=max(self.x, other.x), y=max(self.y, other.y))
+class SearchObserver:
+    """
+    Receives events from a ReindeerSearch. Override the ones of interest.
+    """
 
-    def move(self, dx, dy):
-        return self._replace(x=self.x+dx, y=self.y+dy)
+    def state_popped(self, search, state):
+        pass
 
-    def rows(self):
-        for y in range(self.y+1):
-            yield Point(x=self.x, y=y)
+    def state_relaxed(self, search, state, tiles):
+        pass
 
-    def columns(self):
-        for x in range(self.x+1):
-            yield Point(x=x, y=self.y)
+    def goal_found(self, search, state):
+        pass
 
-class Direction(collections.namedtuple("Direction", ["direction"])):
+    def search_done(self, search, solution):
+        pass
 
-    EAST = 0
-    SOUTH = 1
-    WEST = 2
-    NORTH = 3
 
-    @classmethod
-    def east(cls):
-        return cls(cls.EAST)
+class TerminalRenderer(SearchObserver):
+    """
+    Draws the search in a terminal. Explored tiles are shown as ":" and the
+    best trail to the most recently popped state as ".". At most fps frames
+    are drawn per second. Tiles explored since the last frame and tiles that
+    entered or left the trail are the only ones looked at, and only those
+    that changed are redrawn, using ANSI cursor movement.
 
-    def rotate_clockwise(self):
-        return self._replace(direction=(self.direction+1)%4)
+    >>> stream = io.StringIO()
+    >>> maze = MazeParser().parse_lines(["#####", "#S.E#", "#####"])
+    >>> renderer = TerminalRenderer(maze, stream=stream, fps=None)
+    >>> renderer.draw({6: "."})
+    >>> renderer.draw({6: ".", 7: "."})
+    >>> stream.getvalue()
+    '\\x1b[2J\\x1b[H#####\\n#S E#\\n#####\\n\\x1b[2;2H.\\x1b[2;3H.'
 
-    def rotate_counterclockwise(self):
-        return self._replace(direction=(self.direction-1)%4)
+    Tiles are explored and the trail moves:
+
+    >>> stream = io.StringIO()
+    >>> renderer = TerminalRenderer(maze, stream=stream, fps=None)
+    >>> renderer.state_relaxed(None, 7, [6, 7])
+    >>> renderer.draw_trail([6])
+    >>> renderer.draw_trail([7])
+    >>> stream.getvalue()
+    '\\x1b[2J\\x1b[H#####\\n#S E#\\n#####\\n\\x1b[2;2H.\\x1b[2;3H:\\x1b[2;2H:\\x1b[2;3H.'
+    """
+
+    def __init__(self, maze, stream=None, fps=30):
+        self.maze = maze
+        self.stream = sys.stdout if stream is None else stream
+        self.frame_time = 0 if fps is None else 1 / fps
+        self.last_frame = None
+        self.explored = set()
+        self.changed = set()
+        self.trail = set()
+        self.shown = {}
+        self.stream.write("\x1b[2J\x1b[H")
+        self.stream.write(self.maze.render())
+
+    def state_popped(self, search, state):
+        now = time.monotonic()
+        if self.last_frame is None or now - self.last_frame >= self.frame_time:
+            self.last_frame = now
+            self.draw_trail(search.trail([state]))
+
+    def state_relaxed(self, search, state, tiles):
+        for tile in tiles:
+            if tile not in self.explored:
+                self.explored.add(tile)
+                self.changed.add(tile)
+
+    def search_done(self, search, solution):
+        self.draw_trail(solution.trail)
+        height = len(self.maze.free) // self.maze.width
+        self.stream.write(f"\x1b[{height + 1};1H")
+        self.stream.flush()
+
+    def draw_trail(self, trail):
+        trail = set(trail)
+        changed = self.changed | (self.trail ^ trail)
+        self.changed = set()
+        self.trail = trail
+        self.draw({tile: self.char(tile) for tile in sorted(changed)})
+
+    def char(self, tile):
+        if tile in self.trail:
+            return "."
+        elif tile in self.explored:
+            return ":"
+        else:
+            return self.maze.tile_char(tile)
+
+    def draw(self, chars):
+        for tile, char in chars.items():
+            if self.shown.get(tile, self.maze.tile_char(tile)) != char:
+                y, x = divmod(tile, self.maze.width)
+                self.stream.write(f"\x1b[{y + 1};{x + 1}H{char}")
+                self.shown[tile] = char
+        self.stream.flush()
 
-    def move(self, point):
-        dx = {self.EAST: 1, self.WEST: -1}.get(self.direction, 0)
-        dy = {self.SOUTH: 1, self.NORTH: -1}.get(self.direction, 0)
-        return point.move(dx=dx, dy=dy)
 
 if __name__ == "__main__":
     if "interactive" in sys.argv[1:]:
-        MazeParser().parse_lines(small).solve(interactive=True)
-    import doctest
-    doctest.testmod()
-    print("OK")
+        MazeParser().parse().solve(interactive=True)
+    else:
+        import doctest
+
+        doctest.testmod()
+        print("OK")
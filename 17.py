@@ -44,32 +44,41 @@ Part 2:
 236548287712877
 """
 
-def find_a(program, A=0):
-    if program:
-        last = NotFoundError(f"A={A}, program={program}")
-        for next_a in find_next(A, program[-1]):
-            try:
-                return find_a(program[:-1], next_a)
-            except NotFoundError as e:
-                last = e
-        raise last
-    else:
-        return A
+
+def find_a(program, B=0, C=0):
+    """
+    Find the lowest A that makes the program output itself.
+
+    Programs of the usual shape loop until A is 0, shift A right 3 bits each
+    time, and output one number per loop. So the last output depends only
+    on the highest 3 bits of A, the second to last on the highest 6, and so
+    on. A is built 3 bits at a time from the last output backwards, keeping
+    every candidate that produces the expected tail of the program. Each
+    candidate extends a different shorter A, so no A is ever run twice and
+    there are no outputs worth remembering.
+
+    >>> find_a([0, 3, 5, 4, 3, 0], B=0, C=0)
+    117440
+    """
+    compiled = CompiledProgram(program)
+    candidates = [0]
+    for index in reversed(range(len(program))):
+        tail = program[index:]
+        registers = [(A * 8 + bits, B, C) for A in candidates for bits in range(8)]
+        candidates = [
+            A
+            for (A, _, _), output in zip(registers, compiled.run_many(registers))
+            if output == tail
+        ]
+    candidates = [A for A in candidates if A != 0]
+    if not candidates:
+        raise NotFoundError(f"program={program}")
+    return min(candidates)
+
 
 class NotFoundError(Exception):
     pass
 
-def find_next(A, number):
-    for a3 in [0, 1]:
-        for a2 in [0, 1]:
-            for a1 in [0, 1]:
-                A = (A << 1) | a3
-                A = (A << 1) | a2
-                A = (A << 1) | a1
-                numbers = manually_decompiled(A)
-                if numbers and numbers[0] == number:
-                    yield A
-                A = A >> 3
 
 def manually_decompiled(A=47006051):
     output = []
@@ -84,8 +93,11 @@ def manually_decompiled(A=47006051):
         output.append(out)
     return output
 
+
+import concurrent.futures
 import operator
 
+
 class ComputerParser:
 
     def parse(self):
@@ -105,6 +117,7 @@ class ComputerParser:
                 assert line.strip() == "", line
         return computer
 
+
 class Computer:
 
     def __init__(self):
@@ -112,6 +125,7 @@ class Computer:
         self.program = []
         self.instruction_pointer = 0
         self.outs = []
+        self.compiled = None
 
     def set_register(self, name, value):
         self.registers[name] = value
@@ -129,13 +143,21 @@ class Computer:
         self.outs.append(number)
 
     def run(self):
-        while self.instruction_pointer < len(self.program):
-            instruction = Instruction(self.program[self.instruction_pointer])
-            operand = Operand(self.program[self.instruction_pointer+1])
-            self.instruction_pointer += 2
-            instruction.eval(self, operand)
+        outs, A, B, C = self.compile().run(
+            self.get_register("A"), self.get_register("B"), self.get_register("C")
+        )
+        self.set_register("A", A)
+        self.set_register("B", B)
+        self.set_register("C", C)
+        self.instruction_pointer = len(self.program)
+        self.outs.extend(outs)
         return ",".join(str(x) for x in self.outs)
 
+    def compile(self):
+        if self.compiled is None or self.compiled.program != self.program:
+            self.compiled = CompiledProgram(self.program)
+        return self.compiled
+
     def print(self):
         for name, value in self.registers.items():
             print(f"Register {name}: {value}")
@@ -150,14 +172,147 @@ class Computer:
                 value = Operand(instruction)
             print(f"{prefix} {value}")
 
+
+class CompiledProgram:
+    """
+    The program translated once into a Python function with the registers in
+    local variables.
+
+    Jump targets are literals, so the control flow is known up front. The
+    program is split into blocks that each start at the beginning or at a
+    jump target and run until a jump or the end of the program.
+
+    >>> print(ComputerParser().parse().compile().source)
+    def run(A, B, C):
+        out = []
+        block = 0
+        while True:
+            if block == 0:
+                B = A & 7
+                B = B ^ 3
+                C = A >> B
+                B = B ^ 5
+                A = A >> 3
+                B = B ^ C
+                out.append(B & 7)
+                if A != 0:
+                    block = 0
+                    continue
+                block = 16
+                continue
+            if block == 16:
+                return out, A, B, C
+            return out, A, B, C
+    """
+
+    OPERATIONS = {
+        0: "A = A >> {combo}",
+        1: "B = B ^ {literal}",
+        2: "B = {combo} & 7",
+        4: "B = B ^ C",
+        5: "out.append({combo} & 7)",
+        6: "B = A >> {combo}",
+        7: "C = A >> {combo}",
+    }
+
+    COMBOS = {0: "0", 1: "1", 2: "2", 3: "3", 4: "A", 5: "B", 6: "C"}
+
+    def __init__(self, program):
+        self.program = list(program)
+        self.source = self.generate()
+        namespace = {}
+        exec(self.source, namespace)
+        self.run = namespace["run"]
+
+    def run_many(self, registers, processes=None):
+        """
+        Run the program once for each (A, B, C) in registers and return the
+        outputs in the same order.
+
+        >>> compiled = ComputerParser().parse().compile()
+        >>> compiled.run_many([(47006051, 0, 0), (729, 0, 0)])
+        [[6, 2, 7, 2, 3, 1, 6, 0, 5], [1, 6, 6, 7]]
+
+        The runs can be spread over multiple processes. Each process compiles
+        the program itself since compiled functions can not be sent between
+        processes:
+
+        >>> compiled.run_many([(A, 0, 0) for A in range(100)], processes=2) == (
+        ...     compiled.run_many([(A, 0, 0) for A in range(100)])
+        ... )
+        True
+        >>> compiled.run_many([], processes=2)
+        []
+        """
+        if processes:
+            registers = list(registers)
+            size = max(1, -(-len(registers) // processes))
+            chunks = [
+                registers[start : start + size]
+                for start in range(0, len(registers), size)
+            ]
+            with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+                return [
+                    output
+                    for outputs in executor.map(
+                        run_many, [self.program] * len(chunks), chunks
+                    )
+                    for output in outputs
+                ]
+        run = self.run
+        return [run(A, B, C)[0] for A, B, C in registers]
+
+    def generate(self):
+        lines = [
+            "def run(A, B, C):",
+            "    out = []",
+            "    block = 0",
+            "    while True:",
+        ]
+        generated = set()
+        to_generate = [0]
+        while to_generate:
+            start = to_generate.pop(0)
+            if start not in generated:
+                generated.add(start)
+                lines.append(f"        if block == {start}:")
+                for line in self.generate_block(start, to_generate):
+                    lines.append(f"            {line}")
+        lines.append("        return out, A, B, C")
+        return "\n".join(lines)
+
+    def generate_block(self, start, to_generate):
+        halt = "return out, A, B, C"
+        ip = start
+        while ip + 1 < len(self.program):
+            opcode = self.program[ip]
+            operand = self.program[ip + 1]
+            ip += 2
+            if opcode == 3:
+                to_generate.extend([operand, ip])
+                yield "if A != 0:"
+                yield f"    block = {operand}"
+                yield "    continue"
+                yield f"block = {ip}"
+                yield "continue"
+                return
+            template = self.OPERATIONS[opcode]
+            if "{combo}" in template and operand not in self.COMBOS:
+                yield 'raise ValueError("invalid operand")'
+                return
+            yield template.format(combo=self.COMBOS.get(operand), literal=operand)
+        yield halt
+
+
+def run_many(program, registers):
+    return CompiledProgram(program).run_many(registers)
+
+
 class Instruction:
 
     def __init__(self, number):
         self.number = number
 
-    def eval(self, computer, operand):
-        self.compile().eval(computer, operand)
-
     def compile(self):
         return {
             0: Adv(),
@@ -173,100 +328,60 @@ class Instruction:
     def __repr__(self):
         return str(self.compile())
 
-class Adv:
 
-    def eval(self, computer, operand):
-        computer.set_register(
-            "A",
-            computer.get_register("A") // 2**operand.eval_combo(computer)
-        )
+class Adv:
 
     def __repr__(self):
         return "adv: A = A // 2**combo"
 
-class Bxl:
 
-    def eval(self, computer, operand):
-        computer.set_register(
-            "B",
-            operator.xor(computer.get_register("B"), operand.eval_literal(computer))
-        )
+class Bxl:
 
     def __repr__(self):
         return "bxl: B = B xor literal"
 
-class Bst:
 
-    def eval(self, computer, operand):
-        computer.set_register(
-            "B",
-            operand.eval_combo(computer) % 8
-        )
+class Bst:
 
     def __repr__(self):
         return "bst: B = combo % 8"
 
-class Jnz:
 
-    def eval(self, computer, operand):
-        if computer.get_register("A") != 0:
-            computer.set_instruction_pointer(operand.eval_literal(computer))
+class Jnz:
 
     def __repr__(self):
         return "jnz: if A != 0 then IP = literal"
 
-class Bxc:
 
-    def eval(self, computer, operand):
-        computer.set_register(
-            "B",
-            operator.xor(computer.get_register("B"), computer.get_register("C"))
-        )
+class Bxc:
 
     def __repr__(self):
         return "bxc: B = B xor C"
 
-class Out:
 
-    def eval(self, computer, operand):
-        computer.add_out(operand.eval_combo(computer) % 8)
+class Out:
 
     def __repr__(self):
         return "out: output(combo % 8)"
 
-class Bdv:
 
-    def eval(self, computer, operand):
-        raise NotImplementedError("bdv never used")
+class Bdv:
 
     def __repr__(self):
         return "bdv: B = A // 2**combo"
 
-class Cdv:
 
-    def eval(self, computer, operand):
-        computer.set_register(
-            "C",
-            computer.get_register("A") // 2**operand.eval_combo(computer)
-        )
+class Cdv:
 
     def __repr__(self):
         return "cdv: C = A // 2**combo"
 
+
 class Operand:
 
     def __init__(self, number):
         self.number = number
 
-    def eval_literal(self, computer):
-        return self.compile_literal().eval(computer)
-
-    def eval_combo(self, computer):
-        return self.compile_combo().eval(computer)
-
-    def compile_literal(self):
-        return Literal(self.number)
-
     def compile_combo(self):
         if self.number in [0, 1, 2, 3]:
             return Literal(self.number)
@@ -282,29 +397,27 @@ class Operand:
     def __repr__(self):
         return f"     literal={self.number} | combo={self.compile_combo()}"
 
+
 class Literal:
 
     def __init__(self, value):
         self.value = value
 
-    def eval(self, computer):
-        return self.value
-
     def __repr__(self):
         return str(self.value)
 
+
 class Register:
 
     def __init__(self, name):
         self.name = name
 
-    def eval(self, computer):
-        return computer.get_register(self.name)
-
     def __repr__(self):
         return self.name
 
+
 if __name__ == "__main__":
     import doctest
+
     doctest.testmod()
     print("OK")
@@ -46,6 +46,8 @@ _#_O#__
 #_#OOOO
 >>> memory_space.steps()
 22
+>>> memory_space.find_blocking_byte().aoc_format()
+'6,1'
 
 Part 1:
 
@@ -55,11 +57,15 @@ Part 1:
 
 Part 2:
 
+>>> print(memory_space.find_blocking_byte().aoc_format())
+31,22
 >>> print(memory_space.simulate_until_blocked().aoc_format())
 31,22
 """
 
+import array
 import collections
+import heapq
 
 class BytePositionParser:
 
@@ -78,9 +84,12 @@ class MemorySpace:
 
     def __init__(self, size):
         self.size = size
-        self.corrupted = set()
+        self.side = size + 1
+        self.corrupted = bytearray(self.side * self.side)
         self.path = set()
-        self.byte_locations = []
+        self.distances = array.array("i")
+        self.parents = array.array("i")
+        self.byte_locations = collections.deque()
 
     def add_incoming_byte(self, x, y):
         self.byte_locations.append(Point(x=x, y=y))
@@ -89,10 +98,10 @@ class MemorySpace:
         for y in range(self.size+1):
             line = []
             for x in range(self.size+1):
-                point = Point(x=x, y=y)
-                if point in self.corrupted:
+                cell = self.cell(Point(x=x, y=y))
+                if self.corrupted[cell]:
                     line.append("#")
-                elif point in self.path:
+                elif cell in self.path:
                     line.append("O")
                 else:
                     line.append("_")
@@ -104,51 +113,208 @@ class MemorySpace:
         return self
 
     def simulate_until_blocked(self):
+        if not self.distances:
+            self.find_path()
         while True:
             location = self.fall_single()
-            if location in self.path:
-                try:
-                    self.find_path()
-                except NoSolution:
-                    return location
+            try:
+                self.repair_path(self.cell(location))
+            except NoSolution:
+                return location
+
+    def find_blocking_byte(self):
+        """
+        Find the first incoming byte that cuts off the exit without letting
+        any bytes fall.
+
+        Bytes are removed in reverse order instead. Free cells are joined
+        with their free neighbours in a union-find structure, and the first
+        removed byte that connects start and goal is the one that blocked
+        them.
+
+        >>> memory_space = MemorySpace(size=1)
+        >>> memory_space.add_incoming_byte(1, 0)
+        >>> memory_space.add_incoming_byte(0, 1)
+        >>> memory_space.find_blocking_byte()
+        Point(x=0, y=1)
+        >>> memory_space.simulate_fall(1).find_blocking_byte()
+        Point(x=0, y=1)
+
+        Returns None if the exit is never cut off.
+        """
+        byte_locations = list(self.byte_locations)
+        side = self.side
+        start = 0
+        goal = side * side - 1
+        parents = list(range(side * side))
+        fall_times = [
+            -1 if corrupted else None for corrupted in self.corrupted
+        ]
+        for time, point in enumerate(byte_locations):
+            cell = self.cell(point)
+            if fall_times[cell] is None:
+                fall_times[cell] = time
+
+        def find(cell):
+            while parents[cell] != cell:
+                parents[cell] = parents[parents[cell]]
+                cell = parents[cell]
+            return cell
+
+        def free(cell):
+            fall_times[cell] = None
+            for neighbour in self.neighbours(cell):
+                if fall_times[neighbour] is None:
+                    parents[find(neighbour)] = find(cell)
+
+        def connected():
+            return (
+                fall_times[start] is None and
+                fall_times[goal] is None and
+                find(start) == find(goal)
+            )
+
+        for cell, fall_time in enumerate(fall_times):
+            if fall_time is None:
+                free(cell)
+        if connected():
+            return None
+        for time in reversed(range(len(byte_locations))):
+            point = byte_locations[time]
+            cell = self.cell(point)
+            if fall_times[cell] == time:
+                free(cell)
+                if connected():
+                    return point
+        raise NoSolution("already blocked")
 
     def fall_single(self):
-        location = self.byte_locations.pop(0)
-        self.corrupted.add(location)
+        location = self.byte_locations.popleft()
+        self.corrupted[self.cell(location)] = 1
         return location
 
+    def cell(self, point):
+        return point.y * self.side + point.x
+
     def find_path(self):
+        """
+        Breadth first search from the top left corner to every reachable
+        cell. Every step costs the same, so the first time a cell is reached
+        is along a shortest path to it. The path leads to the bottom right
+        corner.
+
+        >>> memory_space = MemorySpace(size=2)
+        >>> memory_space.corrupted[1] = memory_space.corrupted[4] = 1
+        >>> memory_space.find_path().print()
+        O#_
+        O#_
+        OOO
+        >>> list(memory_space.distances)
+        [0, -1, 6, 1, -1, 5, 2, 3, 4]
+        """
+        corrupted = self.corrupted
+        start = 0
+        distances = array.array("i", [-1]) * len(corrupted)
+        parents = array.array("i", [-1]) * len(corrupted)
+        self.distances = distances
+        self.parents = parents
         self.path = set()
-        start = Point(x=0, y=0)
-        goal = Point(x=self.size, y=self.size)
-        fringe = [start]
-        costs = {start: 0}
-        came_from = {start: None}
+        if corrupted[start]:
+            raise NoSolution("found no path")
+        distances[start] = 0
+        fringe = collections.deque([start])
+        while fringe:
+            cell = fringe.popleft()
+            distance = distances[cell] + 1
+            for neighbour in self.neighbours(cell):
+                if distances[neighbour] == -1 and not corrupted[neighbour]:
+                    distances[neighbour] = distance
+                    parents[neighbour] = cell
+                    fringe.append(neighbour)
+        return self.trace_path()
+
+    def repair_path(self, blocked):
+        """
+        Update the distances from the last search after the given cell has
+        been corrupted.
+
+        Only cells whose shortest path went through the blocked cell are
+        affected. They are the blocked cell's subtree in the parents array.
+        They are cleared and searched again, starting from the unaffected
+        cells around them, which still have correct distances.
+
+        >>> memory_space = MemorySpace(size=2)
+        >>> memory_space.find_path().steps()
+        4
+        >>> memory_space.corrupted[3] = memory_space.corrupted[4] = 1
+        >>> memory_space.repair_path(3).repair_path(4).print()
+        OOO
+        ##O
+        __O
+        >>> list(memory_space.distances)
+        [0, 1, 2, -1, -1, 3, 6, 5, 4]
+        >>> memory_space.corrupted[5] = 1
+        >>> memory_space.repair_path(5)
+        Traceback (most recent call last):
+          ...
+        NoSolution: found no path
+        """
+        distances = self.distances
+        parents = self.parents
+        corrupted = self.corrupted
+        if distances[blocked] == -1:
+            return self
+        subtree = [blocked]
+        distances[blocked] = -1
+        parents[blocked] = -1
+        for cell in subtree:
+            for neighbour in self.neighbours(cell):
+                if parents[neighbour] == cell:
+                    distances[neighbour] = -1
+                    parents[neighbour] = -1
+                    subtree.append(neighbour)
+        fringe = []
+        for cell in subtree:
+            for neighbour in self.neighbours(cell):
+                if distances[neighbour] != -1:
+                    fringe.append((distances[neighbour] + 1, cell, neighbour))
+        heapq.heapify(fringe)
         while fringe:
-            point = fringe.pop(0)
-            if point == goal:
-                point = goal
-                while point is not None:
-                    self.path.add(point)
-                    point = came_from[point]
-                return self
-            else:
-                for neighbour in point.neighbours():
-                    if self.can_be_at(neighbour):
-                        neighbour_cost = costs[point] + 1
-                        if neighbour not in costs or neighbour_cost < costs[neighbour]:
-                            fringe.append(neighbour)
-                            costs[neighbour] = neighbour_cost
-                            came_from[neighbour] = point
-                fringe.sort(key=lambda point: costs[point])
-        raise NoSolution("found no path")
-
-    def can_be_at(self, point):
-        return (
-            point not in self.corrupted and
-            0 <= point.x <= self.size and
-            0 <= point.y <= self.size
-        )
+            distance, cell, parent = heapq.heappop(fringe)
+            if corrupted[cell] or distances[cell] != -1:
+                continue
+            distances[cell] = distance
+            parents[cell] = parent
+            for neighbour in self.neighbours(cell):
+                if distances[neighbour] == -1:
+                    heapq.heappush(fringe, (distance + 1, neighbour, cell))
+        if blocked in self.path:
+            return self.trace_path()
+        return self
+
+    def trace_path(self):
+        cell = len(self.corrupted) - 1
+        if self.distances[cell] == -1:
+            self.path = set()
+            raise NoSolution("found no path")
+        path = set()
+        while cell != -1:
+            path.add(cell)
+            cell = self.parents[cell]
+        self.path = path
+        return self
+
+    def neighbours(self, cell):
+        side = self.side
+        x = cell % side
+        if x > 0:
+            yield cell - 1
+        if x < side - 1:
+            yield cell + 1
+        if cell >= side:
+            yield cell - side
+        if cell + side < len(self.corrupted):
+            yield cell + side
 
     def steps(self):
         return len(self.path) - 1
@@ -158,12 +324,6 @@ class NoSolution(Exception):
 
 class Point(collections.namedtuple("Point", ["x", "y"])):
 
-    def neighbours(self):
-        for dx in [-1, 1]:
-            yield self._replace(x=self.x+dx)
-        for dy in [-1, 1]:
-            yield self._replace(y=self.y+dy)
-
     def aoc_format(self):
         return f"{self.x},{self.y}"
 
@@ -42,7 +42,7 @@ Part 2:
 724388733465031
 """
 
-import pprint
+import concurrent.futures
 
 class OnsenParser:
 
@@ -65,55 +65,92 @@ class Towel:
     def __init__(self, towel):
         self.towel = towel
 
-    def design(self, design):
-        """
-        >>> Towel("foo").design("foobar")
-        'bar'
-        """
-        if design.startswith(self.towel):
-            return design[len(self.towel):]
-        else:
-            raise DesignNotPossible()
-
     def __repr__(self):
         return f"Towel({self.towel!r})"
 
+class TowelTrie:
+    """
+    All towels merged into a prefix tree. Node 0 is the root, children maps
+    a color to the next node, and ends marks nodes where a towel ends.
+
+    >>> trie = TowelTrie()
+    >>> for towel in ["r", "rb", "b"]:
+    ...     trie.add(Towel(towel))
+    >>> list(trie.match_ends("xrbr", 1))
+    [2, 3]
+    >>> list(trie.match_ends("xrbr", 0))
+    []
+    """
+
+    def __init__(self):
+        self.children = [{}]
+        self.ends = [False]
+
+    def add(self, towel):
+        node = 0
+        for color in towel.towel:
+            if color not in self.children[node]:
+                self.children[node][color] = len(self.children)
+                self.children.append({})
+                self.ends.append(False)
+            node = self.children[node][color]
+        self.ends[node] = True
+
+    def match_ends(self, design, start):
+        """
+        Positions in design where a towel placed at start ends.
+        """
+        children = self.children
+        ends = self.ends
+        node = 0
+        for position in range(start, len(design)):
+            node = children[node].get(design[position])
+            if node is None:
+                return
+            if ends[node]:
+                yield position + 1
+
 class Design:
 
     def __init__(self, design):
         self.design = design
-        self.cache = {}
-
-    def is_possible(self, towels):
-        return self.count_ways_to_make(towels) > 0
-
-    def count_ways_to_make(self, towels):
-        return self.count_ways_to_make_rest(self.design, towels)
-
-    def count_ways_to_make_rest(self, rest_design, towels):
-        if rest_design not in self.cache:
-            if rest_design:
-                self.cache[rest_design] = 0
-                for towel in towels:
-                    try:
-                        self.cache[rest_design] += self.count_ways_to_make_rest(
-                            towel.design(rest_design),
-                            towels
-                        )
-                    except DesignNotPossible:
-                        pass
-            else:
-                self.cache[rest_design] = 1
-        return self.cache[rest_design]
+
+    def is_possible(self, trie):
+        return self.count_ways_to_make(trie) > 0
+
+    def count_ways_to_make(self, trie):
+        """
+        ways[position] is the number of ways to make the design from position
+        to the end. It is computed from the end backwards so that the ways
+        after every towel placed at position are already known.
+
+        >>> trie = TowelTrie()
+        >>> for towel in ["r", "g", "rg"]:
+        ...     trie.add(Towel(towel))
+        >>> Design("rgrg").count_ways_to_make(trie)
+        4
+        >>> Design("rgb").count_ways_to_make(trie)
+        0
+        """
+        design = self.design
+        ways = [0] * (len(design) + 1)
+        ways[len(design)] = 1
+        for position in reversed(range(len(design))):
+            ways[position] = sum(
+                ways[end] for end in trie.match_ends(design, position)
+            )
+        return ways[0]
 
 class Onsen:
 
     def __init__(self):
         self.towels = []
         self.designs = []
+        self.trie = TowelTrie()
 
     def add_towel(self, towel):
         self.towels.append(towel)
+        self.trie.add(towel)
 
     def add_design(self, design):
         self.designs.append(design)
@@ -121,18 +158,48 @@ class Onsen:
     def count_possible_towel_designs(self):
         count = 0
         for design in self.designs:
-            if design.is_possible(self.towels):
+            if design.is_possible(self.trie):
                 count += 1
         return count
 
-    def count_ways_to_make_towel_designs(self):
+    def count_ways_to_make_towel_designs(self, processes=None):
+        """
+        The designs can be split over multiple processes. Each process
+        builds its own trie from the towels once:
+
+        >>> OnsenParser().parse().count_ways_to_make_towel_designs(processes=2)
+        724388733465031
+        >>> OnsenParser().parse_lines(["r, g", ""]).count_ways_to_make_towel_designs(
+        ...     processes=2
+        ... )
+        0
+        """
+        if processes:
+            towels = [towel.towel for towel in self.towels]
+            designs = [design.design for design in self.designs]
+            size = max(1, -(-len(designs) // processes))
+            chunks = [
+                designs[start:start+size]
+                for start in range(0, len(designs), size)
+            ]
+            with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+                return sum(executor.map(
+                    count_ways_to_make_designs,
+                    [towels] * len(chunks),
+                    chunks
+                ))
         return sum(
-            design.count_ways_to_make(self.towels)
+            design.count_ways_to_make(self.trie)
             for design in self.designs
         )
 
-class DesignNotPossible(Exception):
-    pass
+def count_ways_to_make_designs(towels, designs):
+    onsen = Onsen()
+    for towel in towels:
+        onsen.add_towel(Towel(towel))
+    for design in designs:
+        onsen.add_design(Design(design))
+    return onsen.count_ways_to_make_towel_designs()
 
 if __name__ == "__main__":
     import doctest
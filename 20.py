@@ -222,31 +222,61 @@ class RaceResults:
         return self.cheat_scores(**kwargs).count()
 
     def cheat_scores(self, maximum_cheat_duration, minimum_picoseconds_saved):
+        """
+        A cheat from a track cell ends somewhere in the diamond of cells
+        within maximum_cheat_duration steps of it. The costs are laid out in
+        a dense row by row array with a margin that wide around the track,
+        so the diamond is the same list of index offsets for every cell and
+        needs no bounds checks. Cells off the track cost more than any cheat
+        can save.
+
+        >>> RaceResults({
+        ...     Point(0, 0): 4,
+        ...     Point(0, 1): 3,
+        ...     Point(1, 1): 2,
+        ...     Point(2, 1): 1,
+        ...     Point(2, 0): 0,
+        ... }, Point(0, 0)).cheat_scores(2, 1).scores
+        Counter({2: 1})
+        """
+        radius = maximum_cheat_duration
+        width = max(point.x for point in self.costs_to_end) + 1 + 2 * radius
+        height = max(point.y for point in self.costs_to_end) + 1 + 2 * radius
+        costs = [self.score() + 1] * (width * height)
+        for point, cost in self.costs_to_end.items():
+            costs[(point.y + radius) * width + point.x + radius] = cost
+        offsets = [
+            (dy * width + dx, abs(dx) + abs(dy))
+            for dy in range(-radius, radius + 1)
+            for dx in range(abs(dy) - radius, radius - abs(dy) + 1)
+            if dx or dy
+        ]
         cheat_scores = CheatScores()
-        for start in self.costs_to_end:
-            for end in self.costs_to_end:
-                manhattan = start.manhattan_to(end)
-                if 1 <= manhattan <= maximum_cheat_duration:
-                    save = self.costs_to_end[start] - (self.costs_to_end[end]+manhattan)
-                    if save >= minimum_picoseconds_saved:
-                        cheat_scores.add(save)
+        for point, cost in self.costs_to_end.items():
+            if cost > minimum_picoseconds_saved:
+                index = (point.y + radius) * width + point.x + radius
+                cheat_scores.add_all(
+                    save
+                    for save in [
+                        cost - manhattan - costs[index + offset]
+                        for offset, manhattan in offsets
+                    ]
+                    if save >= minimum_picoseconds_saved
+                )
         return cheat_scores
 
 class CheatScores:
 
     def __init__(self):
-        self.scores = {}
+        self.scores = collections.Counter()
 
     def print(self):
         for saved in sorted(self.scores.keys()):
             print(f"- {self.scores[saved]} save {saved} picoseconds")
         print(f"Total: {self.count()}")
 
-    def add(self, points_saved):
-        if points_saved not in self.scores:
-            self.scores[points_saved] = 1
-        else:
-            self.scores[points_saved] += 1
+    def add_all(self, points_saved):
+        self.scores.update(points_saved)
 
     def best(self):
         return max(self.scores.keys())
@@ -256,9 +286,6 @@ class CheatScores:
 
 class Point(collections.namedtuple("Point", ["x", "y"])):
 
-    def manhattan_to(self, other):
-        return abs(self.x-other.x) + abs(self.y-other.y)
-
     def moves(self):
         for dy in [-1, 1]:
             yield self.move(dy=dy)